@@ -0,0 +1,78 @@
+"""
+Benchmark del arranque del backend.
+
+Mide en procesos nuevos lo que tarda importar src.shitplit.backend.main y
+lo que tarda la app en estar lista (lifespan y /readyz con almacenamiento en
+memoria). Falla si la mediana supera el máximo o si el import carga módulos
+pesados que solo deberían cargarse al usarse.
+
+    python -m benchmarks.arranque
+    python -m benchmarks.arranque --maximo-import-ms 800 --repeticiones 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+# Módulos que no deben cargarse solo por importar el backend
+PROHIBIDOS = ["pandas", "icecream", "numpy", "pymongo", "multiprocessing"]
+
+# Raíz del repositorio, para que el subproceso encuentre src/ se lance desde donde se lance
+RAIZ = Path(__file__).resolve().parent.parent
+
+MEDICION = """
+import json, sys, time
+inicio = time.perf_counter()
+import src.shitplit.backend.main as main
+importado = time.perf_counter()
+from fastapi.testclient import TestClient
+antes = time.perf_counter()
+with TestClient(main.app) as client:
+    client.get("/readyz").raise_for_status()
+    listo = time.perf_counter()
+print(json.dumps({
+    "import_ms": (importado - inicio) * 1000,
+    "listo_ms": (listo - antes) * 1000,
+    "cargados": [m for m in %r if m in sys.modules],
+}))
+""" % PROHIBIDOS
+
+
+def medir_una() -> dict:
+    entorno = dict(os.environ, STORAGE_BACKEND="memoria")
+    salida = subprocess.run(
+        [sys.executable, "-c", MEDICION], env=entorno, cwd=RAIZ, capture_output=True, text=True, check=True
+    )
+    return json.loads(salida.stdout.strip().splitlines()[-1])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--maximo-import-ms", type=float, default=1000, help="mediana máxima del import")
+    parser.add_argument("--maximo-listo-ms", type=float, default=500, help="mediana máxima hasta /readyz")
+    args = parser.parse_args()
+
+    medidas = [medir_una() for _ in range(args.repeticiones)]
+    import_ms = statistics.median(m["import_ms"] for m in medidas)
+    listo_ms = statistics.median(m["listo_ms"] for m in medidas)
+    print(f"import: {import_ms:.1f} ms, hasta listo: {listo_ms:.1f} ms")
+
+    errores = []
+    if import_ms > args.maximo_import_ms:
+        errores.append(f"El import tarda {import_ms:.1f} ms (máximo {args.maximo_import_ms} ms)")
+    if listo_ms > args.maximo_listo_ms:
+        errores.append(f"La app tarda {listo_ms:.1f} ms en estar lista (máximo {args.maximo_listo_ms} ms)")
+    cargados = sorted({m for medida in medidas for m in medida["cargados"]})
+    if cargados:
+        errores.append(f"El import carga módulos pesados: {', '.join(cargados)}")
+    for error in errores:
+        print(error, file=sys.stderr)
+    return 1 if errores else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
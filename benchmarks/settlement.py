@@ -0,0 +1,203 @@
+"""
+Benchmark del motor de ajustes.
+
+Mide el cálculo de ajustes directamente y a través de la app de FastAPI
+(cliente de pruebas en proceso, con almacenamiento en memoria) para grupos
+de 2 a 10.000 participantes, con y sin parejas, y casos degenerados, y el
+reparto de gastos compartidos con pesos.
+Guarda percentiles de latencia y pico de memoria en un JSON de referencia y
+falla si alguna medida empeora más del umbral.
+
+    python -m benchmarks.settlement              # compara con la referencia
+    python -m benchmarks.settlement --guardar    # actualiza la referencia
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable
+
+# La app se importa con almacenamiento en memoria para no necesitar Mongo
+os.environ.setdefault("STORAGE_BACKEND", "memoria")
+# Sin caché de ajustes, para medir el cálculo en cada petición
+os.environ.setdefault("CACHE_AJUSTES_MAX", "0")
+
+from src.shitplit.backend import settlement
+
+REFERENCIA = Path(__file__).parent / "baseline.json"
+TAMAÑOS = [2, 10, 100, 1_000, 10_000]
+
+
+def generar_gastos(n: int, parejas: bool, semilla: int = 0) -> tuple[list[tuple[str, float]], dict[str, str]]:
+    """
+    n participantes con importes aleatorios en céntimos. Si hay parejas,
+    se emparejan los participantes consecutivos.
+    """
+    rng = random.Random(semilla)
+    personas = [f"persona_{i}" for i in range(n)]
+    gastos = [(p, rng.randint(0, 20_000) / 100) for p in personas]
+    cuadrilla: dict[str, str] = {}
+    if parejas:
+        for a, b in zip(personas[::2], personas[1::2]):
+            cuadrilla[a], cuadrilla[b] = b, a
+    return gastos, cuadrilla
+
+
+def casos() -> dict[str, tuple[list[tuple[str, float]], dict[str, str]]]:
+    resultado = {}
+    for n in TAMAÑOS:
+        resultado[f"aleatorio_{n}"] = generar_gastos(n, parejas=False)
+        resultado[f"parejas_{n}"] = generar_gastos(n, parejas=True)
+    resultado["todos_cero_1000"] = ([(f"persona_{i}", 0.0) for i in range(1_000)], {})
+    resultado["un_pagador_1000"] = (
+        [("persona_0", 5_000.0)] + [(f"persona_{i}", 0.0) for i in range(1, 1_000)], {}
+    )
+    return resultado
+
+
+def generar_gastos_compartidos(
+        n: int, gastos: int, beneficiarios: int, semilla: int = 0
+        ) -> list[tuple[str, float, dict[str, float] | None]]:
+    """
+    Gastos repartidos entre subconjuntos de 'beneficiarios' personas con pesos
+    variados. Uno de cada cinco se reparte entre todos.
+    """
+    rng = random.Random(semilla)
+    personas = [f"persona_{i}" for i in range(n)]
+    return [
+        (
+            rng.choice(personas),
+            rng.randint(100, 50_000) / 100,
+            {p: rng.choice((0.5, 1.0, 1.0, 2.0)) for p in rng.sample(personas, beneficiarios)}
+            if rng.random() < 0.8 else None,
+        )
+        for _ in range(gastos)
+    ]
+
+
+def medir(funcion: Callable[[], Any], repeticiones: int) -> dict[str, float]:
+    """
+    Latencias en milisegundos (p50, p95, p99) y pico de memoria en KiB.
+    """
+    funcion()  # calentamiento
+    latencias = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        latencias.append((time.perf_counter() - inicio) * 1000)
+
+    tracemalloc.start()
+    funcion()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    cuantiles = statistics.quantiles(latencias, n=100, method="inclusive") if len(latencias) > 1 else latencias * 99
+    return {
+        "p50_ms": round(cuantiles[49], 4),
+        "p95_ms": round(cuantiles[94], 4),
+        "p99_ms": round(cuantiles[98], 4),
+        "pico_kib": round(pico / 1024, 1),
+    }
+
+
+def repeticiones_para(n: int) -> int:
+    return max(5, min(200, 20_000 // max(n, 1)))
+
+
+def ejecutar() -> dict[str, dict[str, float]]:
+    from fastapi.testclient import TestClient
+    from src.shitplit.backend.main import app
+
+    resultados: dict[str, dict[str, float]] = {}
+    with TestClient(app) as client:
+        for nombre, (gastos, cuadrilla) in casos().items():
+            repeticiones = repeticiones_para(len(gastos))
+            resultados[f"motor/{nombre}"] = medir(
+                lambda: settlement.calcular_ajustes(gastos, cuadrilla), repeticiones
+            )
+            if len(gastos) <= 100:
+                resultados[f"motor_optimo/{nombre}"] = medir(
+                    lambda: settlement.calcular_ajustes(gastos, cuadrilla, "optimo"), repeticiones
+                )
+            cuerpo = [{"Persona": p, "Concepto": "", "Importe": i} for p, i in gastos]
+            resultados[f"api/{nombre}"] = medir(
+                lambda: client.post("/calcular_ajustes", json=cuerpo).raise_for_status(), repeticiones
+            )
+            print(f"{nombre:>20}: motor {resultados[f'motor/{nombre}']['p50_ms']:.3f} ms, "
+                  f"api {resultados[f'api/{nombre}']['p50_ms']:.3f} ms")
+
+    for n, num_gastos in ((100, 1_000), (1_000, 10_000), (5_000, 30_000)):
+        nombre = f"compartido_{n}_{num_gastos}"
+        gastos_compartidos = generar_gastos_compartidos(n, num_gastos, beneficiarios=min(20, n))
+        resultados[f"motor/{nombre}"] = medir(
+            lambda: settlement.ajustar_saldos(settlement.saldos_compartidos(gastos_compartidos)), 5
+        )
+        print(f"{nombre:>20}: motor {resultados[f'motor/{nombre}']['p50_ms']:.3f} ms")
+    return resultados
+
+
+def comparar(
+        resultados: dict[str, dict[str, float]],
+        referencia: dict[str, dict[str, float]],
+        umbral: float,
+        minimo_ms: float
+        ) -> list[str]:
+    """
+    Medidas que empeoran más del umbral relativo respecto a la referencia.
+    Las latencias por debajo de minimo_ms se ignoran porque son puro ruido.
+    """
+    regresiones = []
+    for caso, medidas in resultados.items():
+        base = referencia.get(caso)
+        if base is None:
+            continue
+        # p95 y p99 se guardan como referencia pero son demasiado ruidosos para fallar
+        for clave in ("p50_ms", "pico_kib"):
+            if clave not in base:
+                continue
+            if clave.endswith("_ms") and medidas[clave] < minimo_ms:
+                continue
+            if medidas[clave] > base[clave] * (1 + umbral):
+                regresiones.append(f"{caso} {clave}: {base[clave]} -> {medidas[clave]}")
+    return regresiones
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--referencia", type=Path, default=REFERENCIA)
+    parser.add_argument("--guardar", action="store_true", help="guarda los resultados como nueva referencia")
+    parser.add_argument("--umbral", type=float, default=float(os.getenv("BENCH_UMBRAL", 0.5)),
+                        help="empeoramiento relativo permitido (0.5 = 50%%)")
+    parser.add_argument("--minimo-ms", type=float, default=0.05,
+                        help="latencias menores no se comparan")
+    args = parser.parse_args(argv)
+
+    if not args.guardar and not args.referencia.exists():
+        print(f"No hay referencia en {args.referencia}; genérala con --guardar")
+        return 2
+
+    resultados = ejecutar()
+
+    if args.guardar:
+        args.referencia.write_text(json.dumps(resultados, indent=2, sort_keys=True) + "\n")
+        print(f"Referencia guardada en {args.referencia}")
+        return 0
+
+    referencia = json.loads(args.referencia.read_text())
+    regresiones = comparar(resultados, referencia, args.umbral, args.minimo_ms)
+    if regresiones:
+        print("Regresiones de rendimiento:")
+        for regresion in regresiones:
+            print(f"  {regresion}")
+        return 1
+    print("Sin regresiones.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
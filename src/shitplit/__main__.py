@@ -0,0 +1,155 @@
+"""
+Lanzador de producción del backend y el frontend.
+
+    python -m src.shitplit serve
+    python -m src.shitplit serve --workers 4 --sin-frontend
+
+Arranca varios procesos de uvicorn con el backend, que comparten el socket
+de escucha y que el supervisor de uvicorn vuelve a lanzar si mueren, y el
+servidor web de Flet, que también se relanza si termina. Con SIGTERM o
+SIGINT deja terminar las peticiones en curso y para todo.
+
+Cada worker es un proceso aparte: las métricas se suman a través de
+METRICAS_DIR (un directorio temporal si no se indica), pero las cachés son de
+cada proceso, y cada uno abre su pool de DB_WORKERS hilos y hasta
+MONGO_POOL_SIZE conexiones con Mongo. Sin límite de CPU en el contenedor se
+lanza un worker por CPU del nodo: conviene fijar el límite o BACKEND_WORKERS.
+"""
+import argparse
+import math
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+from src.shitplit.logs import logger
+import src.shitplit.settings as settings
+
+# Segundos antes de relanzar el frontend, para no entrar en bucle si falla al arrancar
+ESPERA_REINICIO_FRONTEND = 2
+
+
+def cpus_disponibles() -> int:
+    """
+    CPUs que puede usar el proceso: las asignadas por afinidad, limitadas
+    por la cuota de CPU del cgroup (el límite del pod en Kubernetes).
+    """
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+    try:
+        cuota, periodo = Path("/sys/fs/cgroup/cpu.max").read_text().split()
+        if cuota != "max":
+            cpus = min(cpus, math.ceil(int(cuota) / int(periodo)))
+    except (OSError, ValueError):
+        pass
+    return max(1, cpus)
+
+
+class Frontend:
+    """
+    Servidor web de Flet en su propio grupo de procesos, relanzado si termina.
+    """
+    def __init__(self, puerto: int) -> None:
+        self.puerto = puerto
+        self.proceso: subprocess.Popen | None = None
+        self.parar = threading.Event()
+        self.lock = threading.Lock()
+        self.hilo = threading.Thread(target=self._vigilar, name="frontend", daemon=True)
+        # La app importa src.shitplit: se lanza con la raíz del proyecto en el path
+        rutas = [os.getcwd(), *filter(None, [os.environ.get("PYTHONPATH")])]
+        self.entorno = dict(os.environ, PYTHONPATH=os.pathsep.join(rutas))
+
+    def iniciar(self) -> None:
+        self.hilo.start()
+
+    def _vigilar(self) -> None:
+        while True:
+            with self.lock:
+                if self.parar.is_set():
+                    return
+                # flet run lanza a su vez la app: con una sesión propia se paran juntos
+                self.proceso = subprocess.Popen(
+                    ["flet", "run", settings.FRONTEND_SCRIPT, "--web", "--port", str(self.puerto)],
+                    env=self.entorno,
+                    start_new_session=True,
+                )
+            codigo = self.proceso.wait()
+            if self.parar.is_set():
+                return
+            logger.warning("El frontend ha terminado con código %s, se vuelve a lanzar", codigo)
+            self.parar.wait(ESPERA_REINICIO_FRONTEND)
+
+    def detener(self, espera: float) -> None:
+        with self.lock:
+            self.parar.set()
+        if self.proceso is not None and self.proceso.poll() is None:
+            os.killpg(self.proceso.pid, signal.SIGTERM)
+            try:
+                self.proceso.wait(espera)
+            except subprocess.TimeoutExpired:
+                os.killpg(self.proceso.pid, signal.SIGKILL)
+        self.hilo.join(espera)
+
+
+def serve(workers: int, frontend: bool) -> None:
+    import uvicorn
+
+    cpus = cpus_disponibles()
+    workers = workers or cpus
+    if settings.STORAGE_BACKEND == "memoria" and workers > 1:
+        logger.warning("Con almacenamiento en memoria cada proceso tendría sus datos: se usa un solo worker")
+        workers = 1
+    # Cada worker tiene su pool de procesos para los lotes grandes: se reparten las CPU
+    os.environ.setdefault("LOTE_WORKERS", str(max(1, cpus // workers)))
+    # Los workers leen la configuración al importarla, después de esto
+    metricas_temporales = None
+    if workers > 1 and not settings.METRICAS_DIR:
+        metricas_temporales = tempfile.mkdtemp(prefix="shitplit-metricas-")
+        os.environ["METRICAS_DIR"] = metricas_temporales
+
+    # SIGTERM termina con SystemExit, para parar el frontend al salir. Uvicorn
+    # pone sus manejadores mientras sirve y vuelve a lanzar la señal al terminar
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    servidor_web = Frontend(settings.FRONTEND_PORT) if frontend else None
+    if servidor_web is not None:
+        servidor_web.iniciar()
+    logger.info(
+        "Backend con %d workers en %s:%d (%d conexiones con Mongo como mucho)",
+        workers, settings.SERVIDOR_HOST, settings.BACKEND_PORT, workers * settings.MONGO_POOL_SIZE,
+    )
+    try:
+        uvicorn.run(
+            "src.shitplit.backend.main:app",
+            host=settings.SERVIDOR_HOST,
+            port=settings.BACKEND_PORT,
+            workers=workers,
+            timeout_graceful_shutdown=settings.SERVIDOR_ESPERA_CIERRE,
+            log_level=settings.LOG_LEVEL.lower(),
+        )
+    finally:
+        if servidor_web is not None:
+            servidor_web.detener(settings.SERVIDOR_ESPERA_CIERRE)
+        if metricas_temporales is not None:
+            shutil.rmtree(metricas_temporales, ignore_errors=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m src.shitplit")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+    servir = comandos.add_parser("serve", help="arranca el backend y el frontend")
+    servir.add_argument(
+        "--workers", type=int, default=settings.BACKEND_WORKERS,
+        help="procesos del backend (0: uno por CPU disponible)",
+    )
+    servir.add_argument("--sin-frontend", action="store_true", help="arranca solo el backend")
+    args = parser.parse_args()
+
+    if args.comando == "serve":
+        serve(args.workers, not args.sin_frontend)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Caché LRU con caducidad de los ajustes calculados.
+
+La clave resume lo único que usa el motor: lo que ha pagado cada persona, en
+orden de aparición (el voraz depende de ese orden), junto con la versión de
+la cuadrilla y el modo. Al cambiar una cuadrilla sus resultados anteriores
+dejan de coincidir con ninguna clave y acaban saliendo por antigüedad.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Iterable
+
+from src.shitplit.backend import metrics
+import src.shitplit.settings as settings
+
+
+def clave_ajustes(pagos: Iterable[tuple[str, int]], version: str, modo: str) -> str:
+    contenido = json.dumps([version, modo, list(pagos)], ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha1(contenido.encode()).hexdigest()
+
+
+class CacheAjustes:
+    def __init__(self, maximo: int = settings.CACHE_AJUSTES_MAX, ttl: float = settings.CACHE_AJUSTES_TTL) -> None:
+        self.maximo = maximo
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entradas: OrderedDict[str, tuple[float, list[dict[str, Any]]]] = OrderedDict()
+
+    def get(self, clave: str) -> list[dict[str, Any]] | None:
+        """
+        Ajustes guardados para la clave, o None si no están o han caducado.
+        El resultado es compartido y no debe modificarse.
+        """
+        with self.lock:
+            entrada = self.entradas.get(clave)
+            if entrada is not None and time.monotonic() - entrada[0] < self.ttl:
+                self.entradas.move_to_end(clave)
+                metrics.cache_ajustes.inc("acierto")
+                return entrada[1]
+            if entrada is not None:
+                del self.entradas[clave]
+        metrics.cache_ajustes.inc("fallo")
+        return None
+
+    def put(self, clave: str, ajustes: list[dict[str, Any]]) -> None:
+        if self.maximo <= 0:
+            return
+        with self.lock:
+            self.entradas[clave] = (time.monotonic(), ajustes)
+            self.entradas.move_to_end(clave)
+            while len(self.entradas) > self.maximo:
+                self.entradas.popitem(last=False)
+
+
+cache_ajustes = CacheAjustes()
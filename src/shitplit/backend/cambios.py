@@ -0,0 +1,155 @@
+"""
+Cambios en vivo de las barbacoas guardadas (server-sent events).
+
+Guardar, eliminar o importar barbacoas publica un evento en el almacenamiento
+con un número de secuencia por grupo. En cada proceso, mientras haya alguien
+escuchando un grupo, una sola tarea lee los eventos nuevos y los reparte a
+todas las conexiones: al momento si se publican desde este proceso y cada
+CAMBIOS_INTERVALO segundos si llegan de otro worker. Quien reconecta con
+Last-Event-ID recibe los que se ha perdido.
+"""
+import asyncio
+import json
+import logging
+import time
+from typing import Any, AsyncIterator
+
+from src.shitplit.backend.db.repository import BarbacoaRepository
+import src.shitplit.settings as settings
+
+logger = logging.getLogger("shitplit")
+
+# Eventos pendientes por conexión: si se llena, se cierra y el cliente reconecta
+COLA_MAX = 100
+# Segundos que se espera un evento que falta en la secuencia antes de saltarlo
+ESPERA_HUECO = 5
+# Milisegundos que espera el navegador para reconectar
+RECONEXION_MS = 3_000
+RECARGAR: dict[str, Any] = {"tipo": "recargar"}
+
+
+class Suscripcion:
+    def __init__(self) -> None:
+        self.cola: asyncio.Queue[tuple[int, dict[str, Any]]] = asyncio.Queue(maxsize=COLA_MAX)
+        self.desbordada = False
+
+
+class Canal:
+    def __init__(self, ultimo: int) -> None:
+        # Último evento repartido
+        self.ultimo = ultimo
+        self.suscripciones: set[Suscripcion] = set()
+        self.despertar = asyncio.Event()
+        self.hueco_desde: float | None = None
+        self.tarea: asyncio.Task | None = None
+
+
+class CambiosBarbacoas:
+    def __init__(
+            self,
+            intervalo: float = settings.CAMBIOS_INTERVALO,
+            latido: float = settings.CAMBIOS_LATIDO
+            ) -> None:
+        self.intervalo = intervalo
+        self.latido = latido
+        self.canales: dict[str, Canal] = {}
+
+    async def publicar(self, repo: BarbacoaRepository, grupo: str, evento: dict[str, Any]) -> None:
+        await repo.publicar_evento(grupo, evento)
+        canal = self.canales.get(grupo)
+        if canal is not None:
+            canal.despertar.set()
+
+    async def _vigilar(self, repo: BarbacoaRepository, grupo: str, canal: Canal) -> None:
+        while canal.suscripciones:
+            try:
+                await asyncio.wait_for(canal.despertar.wait(), self.intervalo)
+            except asyncio.TimeoutError:
+                pass
+            canal.despertar.clear()
+            try:
+                nuevos = await repo.eventos(grupo, canal.ultimo)
+            except Exception:
+                logger.warning("No se han podido leer los eventos del grupo %s", grupo, exc_info=True)
+                continue
+            for numero, evento in nuevos:
+                if numero != canal.ultimo + 1:
+                    # Otro proceso ha reservado el número pero aún no ha guardado el evento
+                    canal.hueco_desde = canal.hueco_desde or time.monotonic()
+                    if time.monotonic() - canal.hueco_desde < ESPERA_HUECO:
+                        break
+                canal.hueco_desde = None
+                canal.ultimo = numero
+                for suscripcion in list(canal.suscripciones):
+                    try:
+                        suscripcion.cola.put_nowait((numero, evento))
+                    except asyncio.QueueFull:
+                        suscripcion.desbordada = True
+                        canal.suscripciones.discard(suscripcion)
+        if self.canales.get(grupo) is canal:
+            del self.canales[grupo]
+
+    async def suscribir(
+            self, repo: BarbacoaRepository, grupo: str, desde: int | None = None
+            ) -> AsyncIterator[tuple[int, dict[str, Any]] | None]:
+        """
+        Eventos del grupo posteriores a desde (o a partir de ahora) con su
+        número, y None cada latido sin eventos. Termina si la conexión no
+        consume los eventos al ritmo que llegan.
+        """
+        canal = self.canales.get(grupo)
+        if canal is None:
+            ultimo = await repo.ultimo_evento(grupo)
+            canal = self.canales.setdefault(grupo, Canal(ultimo))
+        suscripcion = Suscripcion()
+        canal.suscripciones.add(suscripcion)
+        if canal.tarea is None or canal.tarea.done():
+            canal.tarea = asyncio.create_task(self._vigilar(repo, grupo, canal))
+        try:
+            enviado = canal.ultimo if desde is None else desde
+            if enviado > canal.ultimo:
+                # Número de otro almacenamiento (p. ej. en memoria antes de reiniciar)
+                yield canal.ultimo, RECARGAR
+                enviado = canal.ultimo
+            elif enviado < canal.ultimo:
+                # Reconexión: los eventos perdidos se leen del almacenamiento
+                perdidos = [e for e in await repo.eventos(grupo, enviado) if e[0] <= canal.ultimo]
+                if not perdidos or perdidos[0][0] != enviado + 1:
+                    # Ya no se conservan todos: hay que volver a cargar el listado
+                    yield canal.ultimo, RECARGAR
+                    enviado = canal.ultimo
+                for numero, evento in perdidos:
+                    if numero > enviado:
+                        enviado = numero
+                        yield numero, evento
+            while True:
+                try:
+                    numero, evento = await asyncio.wait_for(suscripcion.cola.get(), self.latido)
+                except asyncio.TimeoutError:
+                    if suscripcion.desbordada:
+                        return
+                    yield None
+                    continue
+                if numero > enviado:
+                    enviado = numero
+                    yield numero, evento
+                if suscripcion.desbordada and suscripcion.cola.empty():
+                    return
+        finally:
+            canal.suscripciones.discard(suscripcion)
+
+    async def sse(self, repo: BarbacoaRepository, grupo: str, desde: int | None = None) -> AsyncIterator[str]:
+        """
+        Los eventos del grupo en formato text/event-stream.
+        """
+        yield f"retry: {RECONEXION_MS}\n\n"
+        async for cambio in self.suscribir(repo, grupo, desde):
+            if cambio is None:
+                yield ": latido\n\n"
+                continue
+            numero, evento = cambio
+            datos = json.dumps(evento, ensure_ascii=False, separators=(",", ":"))
+            yield f"id: {numero}\nevent: {evento['tipo']}\ndata: {datos}\n\n"
+
+
+cambios_barbacoas = CambiosBarbacoas()
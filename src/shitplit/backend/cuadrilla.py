@@ -0,0 +1,89 @@
+"""
+Caché en memoria de las cuadrillas de cada grupo.
+
+Las cuadrillas se guardan en el almacenamiento. Cada una se vuelve a leer
+como mucho una vez por intervalo, para ver los cambios hechos desde otros
+procesos, y al guardarla desde este se invalida al momento. Si varias
+peticiones la necesitan a la vez solo se lee una vez.
+"""
+import asyncio
+import hashlib
+import json
+import time
+from pathlib import Path
+from typing import Any
+
+from src.shitplit.backend.db.repository import BarbacoaRepository
+import src.shitplit.settings as settings
+
+
+class Cuadrilla:
+    def __init__(self, personas: list[dict[str, Any]]) -> None:
+        self.personas = personas
+        self.parejas: dict[str, str] = {
+            p["nombre"]: p["pareja"] for p in personas if p.get("pareja")
+        }
+        self.colores: dict[str, str] = {
+            p["nombre"]: p["color"] for p in personas if p.get("color")
+        }
+        contenido = json.dumps(personas, sort_keys=True, ensure_ascii=False).encode()
+        self.version = hashlib.sha1(contenido).hexdigest()[:16]
+        self.etag = f'"{self.version}"'
+
+
+def leer_personas(fichero: Path | str) -> list[dict[str, Any]]:
+    """
+    Personas de un fichero como personas.json, o ninguna si no existe.
+    """
+    try:
+        with open(fichero, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return []
+
+
+class CacheCuadrillas:
+    def __init__(self, intervalo: float = settings.CUADRILLA_INTERVALO_COMPROBACION) -> None:
+        self.intervalo = intervalo
+        # Por grupo: cuándo se comprobó y la cuadrilla
+        self.cuadrillas: dict[str, tuple[float, Cuadrilla]] = {}
+        # Lecturas en curso por grupo, para que las peticiones simultáneas esperen la misma
+        self.pendientes: dict[str, asyncio.Task] = {}
+        # Sube al invalidar un grupo: las lecturas empezadas antes no se guardan
+        self.generaciones: dict[str, int] = {}
+
+    async def get(self, repo: BarbacoaRepository, grupo: str) -> Cuadrilla:
+        """
+        Devuelve la cuadrilla del grupo, vacía si no tiene.
+        """
+        entrada = self.cuadrillas.get(grupo)
+        if entrada is not None and time.monotonic() - entrada[0] < self.intervalo:
+            return entrada[1]
+        tarea = self.pendientes.get(grupo)
+        if tarea is None:
+            tarea = asyncio.create_task(self._cargar(repo, grupo, self.generaciones.get(grupo, 0)))
+            self.pendientes[grupo] = tarea
+            tarea.add_done_callback(lambda t: self.pendientes.pop(grupo) if self.pendientes.get(grupo) is t else None)
+        # Si se cancela quien espera, la lectura sigue para los demás
+        return await asyncio.shield(tarea)
+
+    async def _cargar(self, repo: BarbacoaRepository, grupo: str, generacion: int) -> Cuadrilla:
+        ahora = time.monotonic()
+        personas = await repo.get_cuadrilla(grupo) or []
+        entrada = self.cuadrillas.get(grupo)
+        # Si no ha cambiado conservamos la misma, con sus parejas y versión ya calculadas
+        if entrada is not None and entrada[1].personas == personas:
+            cuadrilla = entrada[1]
+        else:
+            cuadrilla = Cuadrilla(personas)
+        if generacion == self.generaciones.get(grupo, 0):
+            self.cuadrillas[grupo] = (ahora, cuadrilla)
+        return cuadrilla
+
+    def invalidar(self, grupo: str) -> None:
+        self.generaciones[grupo] = self.generaciones.get(grupo, 0) + 1
+        self.cuadrillas.pop(grupo, None)
+        self.pendientes.pop(grupo, None)
+
+
+cache_cuadrillas = CacheCuadrillas()
@@ -1,15 +1,48 @@
-import os
+"""
+Repositorio de barbacoas de la app.
 
-from dotenv import load_dotenv
-from pymongo import MongoClient
+No se crea al importar el módulo sino en el arranque de FastAPI (lifespan),
+para que importar el backend sea rápido y un almacenamiento mal configurado
+o caído haga fallar el arranque en lugar de la primera petición.
+"""
+import asyncio
 
-# Cargar las variables de entorno del archivo .env si está disponible
-# Para manejar desde el contenedor Docker
-env_path = "/app/.env" if os.path.exists("/app/.env") else ".env"
-load_dotenv(env_path)
+from src.shitplit.backend.db.repository import BarbacoaRepository
+from src.shitplit.backend.db.storage import crear_store
+import src.shitplit.settings as settings
 
-print(os.getenv("DB_MONGO"))
+repository: BarbacoaRepository | None = None
 
-client = MongoClient(os.getenv("DB_MONGO"))
-db = client["shitplit"]
-collection = db["barbacoas"]
\ No newline at end of file
+
+async def conectar() -> BarbacoaRepository:
+    """
+    Crea el almacenamiento configurado (mongo, sqlite o memoria) y comprueba
+    que responde. Lanza la excepción del almacenamiento si no.
+    """
+    global repository
+    # Abrir SQLite o crear el cliente de Mongo puede bloquear: fuera del bucle
+    store = await asyncio.to_thread(crear_store, settings.STORAGE_BACKEND)
+    nuevo = BarbacoaRepository(store)
+    try:
+        await nuevo.ping()
+    except Exception:
+        nuevo.cerrar()
+        raise
+    repository = nuevo
+    return repository
+
+
+def desconectar() -> None:
+    global repository
+    if repository is not None:
+        repository.cerrar()
+        repository = None
+
+
+def get_repository() -> BarbacoaRepository:
+    """
+    Dependencia de FastAPI con el repositorio de barbacoas.
+    """
+    if repository is None:
+        raise RuntimeError("El almacenamiento no está conectado.")
+    return repository
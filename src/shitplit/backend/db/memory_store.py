@@ -0,0 +1,161 @@
+"""
+Almacenamiento de las barbacoas en memoria, para pruebas y benchmarks.
+"""
+import bisect
+import copy
+import threading
+from collections import defaultdict
+from typing import Any, Callable
+
+from src.shitplit.backend.db.storage import BarbacoaStore, NombreDuplicado
+import src.shitplit.settings as settings
+
+
+class MemoryStore(BarbacoaStore):
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.barbacoas: dict[int, dict[str, Any]] = {}
+        # Por grupo: ids ordenados, para paginar con bisect, e id de cada nombre
+        self.ids: defaultdict[str, list[int]] = defaultdict(list)
+        self.por_nombre: defaultdict[str, dict[str, int]] = defaultdict(dict)
+        self.siguiente_id = 1
+        self.saldos: defaultdict[str, dict[str, int]] = defaultdict(dict)
+        self.cuadrillas: dict[str, list[dict[str, Any]]] = {}
+        self.versiones: dict[str, int] = {}
+        self.eventos_grupo: defaultdict[str, list[tuple[int, dict[str, Any]]]] = defaultdict(list)
+        self.ultimos_eventos: dict[str, int] = {}
+
+    def get_cuadrilla(self, grupo: str) -> list[dict[str, Any]] | None:
+        with self.lock:
+            return copy.deepcopy(self.cuadrillas.get(grupo))
+
+    def guardar_cuadrilla(self, grupo: str, personas: list[dict[str, Any]]) -> None:
+        with self.lock:
+            self.cuadrillas[grupo] = copy.deepcopy(personas)
+
+    def existe(self, grupo: str, nombre: str) -> bool:
+        return nombre in self.por_nombre.get(grupo, {})
+
+    def insertar(self, grupo: str, barbacoa: dict[str, Any]) -> None:
+        with self.lock:
+            if barbacoa["nombre"] in self.por_nombre[grupo]:
+                raise NombreDuplicado(barbacoa["nombre"])
+            self._insertar(grupo, barbacoa)
+
+    def _insertar(self, grupo: str, barbacoa: dict[str, Any]) -> None:
+        id = self.siguiente_id
+        self.siguiente_id += 1
+        self.barbacoas[id] = copy.deepcopy(barbacoa)
+        self.ids[grupo].append(id)
+        self.por_nombre[grupo][barbacoa["nombre"]] = id
+
+    def existentes(self, grupo: str, nombres: list[str]) -> set[str]:
+        nombres_grupo = self.por_nombre.get(grupo, {})
+        return {nombre for nombre in nombres if nombre in nombres_grupo}
+
+    def insertar_varias(self, grupo: str, barbacoas: list[dict[str, Any]]) -> set[int]:
+        fallidas: set[int] = set()
+        with self.lock:
+            for posicion, barbacoa in enumerate(barbacoas):
+                if barbacoa["nombre"] in self.por_nombre[grupo]:
+                    fallidas.add(posicion)
+                else:
+                    self._insertar(grupo, barbacoa)
+        return fallidas
+
+    def eliminar(self, grupo: str, nombre: str) -> dict[str, Any] | None:
+        with self.lock:
+            id = self.por_nombre[grupo].pop(nombre, None)
+            if id is None:
+                return None
+            ids = self.ids[grupo]
+            ids.pop(bisect.bisect_left(ids, id))
+            return self.barbacoas.pop(id)
+
+    def listar(self, grupo: str) -> list[dict[str, Any]]:
+        with self.lock:
+            return copy.deepcopy([self.barbacoas[id] for id in self.ids[grupo]])
+
+    def _pagina(self, grupo: str, limite: int, despues: str | None) -> list[int]:
+        try:
+            desde = int(despues) if despues else 0
+        except ValueError:
+            raise ValueError("Cursor no válido.")
+        ids = self.ids[grupo]
+        inicio = bisect.bisect_right(ids, desde)
+        return ids[inicio:inicio + limite]
+
+    def resumen(
+            self, grupo: str, limite: int, despues: str | None = None
+            ) -> tuple[list[dict[str, Any]], str | None]:
+        with self.lock:
+            barbacoas = [
+                {"id": str(id), "nombre": self.barbacoas[id]["nombre"], "fecha": self.barbacoas[id].get("fecha")}
+                for id in self._pagina(grupo, limite, despues)
+            ]
+        siguiente = barbacoas[-1]["id"] if len(barbacoas) == limite else None
+        return barbacoas, siguiente
+
+    def lote(
+            self, grupo: str, limite: int, despues: str | None = None
+            ) -> tuple[list[dict[str, Any]], str | None]:
+        with self.lock:
+            ids = self._pagina(grupo, limite, despues)
+            barbacoas = copy.deepcopy([self.barbacoas[id] for id in ids])
+        siguiente = str(ids[-1]) if len(ids) == limite else None
+        return barbacoas, siguiente
+
+    def detalle(self, grupo: str, nombre: str) -> dict[str, Any] | None:
+        with self.lock:
+            id = self.por_nombre[grupo].get(nombre)
+            return copy.deepcopy(self.barbacoas[id]) if id is not None else None
+
+    def listar_ajustes(self, grupo: str) -> list[list[dict[str, Any]]]:
+        with self.lock:
+            return copy.deepcopy([self.barbacoas[id].get("ajustes", []) for id in self.ids[grupo]])
+
+    def get_saldos(self, grupo: str) -> dict[str, int]:
+        with self.lock:
+            return {persona: saldo for persona, saldo in self.saldos[grupo].items() if saldo}
+
+    def actualizar_saldos(self, grupo: str, variacion: dict[str, int]) -> None:
+        with self.lock:
+            saldos = self.saldos[grupo]
+            for persona, centimos in variacion.items():
+                saldos[persona] = saldos.get(persona, 0) + centimos
+
+    def reemplazar_saldos(self, grupo: str, saldos: dict[str, int]) -> None:
+        with self.lock:
+            self.saldos[grupo] = dict(saldos)
+
+    def reconstruir_saldos(
+            self, grupo: str, calcular: Callable[[list[list[dict[str, Any]]]], dict[str, int]]
+            ) -> None:
+        with self.lock:
+            ajustes = [self.barbacoas[id].get("ajustes", []) for id in self.ids[grupo]]
+            self.saldos[grupo] = dict(calcular(ajustes))
+
+    def get_version(self, grupo: str) -> int:
+        return self.versiones.get(grupo, 0)
+
+    def incrementar_version(self, grupo: str) -> None:
+        with self.lock:
+            self.versiones[grupo] = self.versiones.get(grupo, 0) + 1
+
+    def publicar_evento(self, grupo: str, evento: dict[str, Any]) -> int:
+        with self.lock:
+            numero = self.ultimos_eventos.get(grupo, 0) + 1
+            self.ultimos_eventos[grupo] = numero
+            eventos = self.eventos_grupo[grupo]
+            eventos.append((numero, copy.deepcopy(evento)))
+            del eventos[:-settings.CAMBIOS_EVENTOS_MAX]
+            return numero
+
+    def eventos(self, grupo: str, despues: int, limite: int = 500) -> list[tuple[int, dict[str, Any]]]:
+        with self.lock:
+            eventos = self.eventos_grupo.get(grupo, [])
+            inicio = bisect.bisect_right(eventos, despues, key=lambda e: e[0])
+            return copy.deepcopy(eventos[inicio:inicio + limite])
+
+    def ultimo_evento(self, grupo: str) -> int:
+        return self.ultimos_eventos.get(grupo, 0)
@@ -0,0 +1,243 @@
+"""
+Almacenamiento de las barbacoas en MongoDB.
+"""
+import os
+from typing import Any
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ASCENDING, MongoClient, ReturnDocument, UpdateOne
+from pymongo.errors import AutoReconnect, BulkWriteError, DuplicateKeyError, NetworkTimeout, OperationFailure
+
+from src.shitplit.backend.db.storage import BarbacoaStore, NombreDuplicado, comprobar_sin_duplicadas
+import src.shitplit.settings as settings
+
+# Campos internos que no se devuelven con las barbacoas
+SIN_INTERNOS = {"_id": 0, "grupo": 0}
+
+
+class MongoStore(BarbacoaStore):
+    errores_transitorios = (AutoReconnect, NetworkTimeout)
+
+    def __init__(self, uri: str | None = None) -> None:
+        uri = uri or os.getenv("DB_MONGO")
+        if not uri:
+            raise ValueError("Falta la variable de entorno DB_MONGO.")
+        # MongoClient no conecta hasta la primera operación: el arranque hace ping
+        self.client = MongoClient(
+            uri,
+            maxPoolSize=settings.MONGO_POOL_SIZE,
+            timeoutMS=settings.MONGO_TIMEOUT_MS,
+            serverSelectionTimeoutMS=settings.MONGO_TIMEOUT_MS,
+            retryReads=True,
+            retryWrites=True,
+        )
+        db = self.client["shitplit"]
+        self.barbacoas = db["barbacoas"]
+        # Saldo acumulado de cada persona en céntimos, a partir de los ajustes guardados
+        self.saldos = db["saldos"]
+        # Una cuadrilla por grupo: {"grupo": ..., "personas": [...]}
+        self.cuadrillas = db["cuadrillas"]
+        # Contadores de cada grupo: {"grupo": ..., "version": n, "eventos": m}
+        self.versiones = db["versiones"]
+        # Últimos eventos de cambio de cada grupo: {"grupo": ..., "id": m, "evento": {...}}
+        self.eventos_grupo = db["eventos"]
+
+    def ping(self) -> None:
+        self.client.admin.command("ping")
+
+    def crear_indices(self) -> None:
+        # Los datos anteriores a los grupos pasan al grupo por defecto
+        sin_grupo = {"grupo": {"$exists": False}}
+        self.barbacoas.update_many(sin_grupo, {"$set": {"grupo": settings.GRUPO_POR_DEFECTO}})
+        self.saldos.update_many(sin_grupo, {"$set": {"grupo": settings.GRUPO_POR_DEFECTO}})
+        for coleccion in (self.barbacoas, self.saldos):
+            if "nombre_1" in coleccion.index_information():
+                try:
+                    coleccion.drop_index("nombre_1")
+                except OperationFailure:
+                    # Otro worker que arranca a la vez ya lo ha quitado
+                    pass
+
+        # Búsquedas por nombre, únicas dentro de cada grupo, y listados paginados por _id
+        indice_nombre = self.barbacoas.index_information().get("grupo_1_nombre_1")
+        if not (indice_nombre or {}).get("unique"):
+            comprobar_sin_duplicadas(self._duplicadas())
+            if indice_nombre is not None:
+                try:
+                    self.barbacoas.drop_index("grupo_1_nombre_1")
+                except OperationFailure:
+                    # Otro worker que arranca a la vez ya lo ha quitado
+                    pass
+        self.barbacoas.create_index([("grupo", ASCENDING), ("nombre", ASCENDING)], unique=True)
+        self.barbacoas.create_index([("grupo", ASCENDING), ("_id", ASCENDING)])
+        self.saldos.create_index([("grupo", ASCENDING), ("nombre", ASCENDING)], unique=True)
+        self.cuadrillas.create_index("grupo", unique=True)
+        self.versiones.create_index("grupo", unique=True)
+        self.eventos_grupo.create_index([("grupo", ASCENDING), ("id", ASCENDING)], unique=True)
+
+    def _duplicadas(self) -> list[tuple[str, str]]:
+        return [
+            (d["_id"]["grupo"], d["_id"]["nombre"])
+            for d in self.barbacoas.aggregate([
+                {"$group": {"_id": {"grupo": "$grupo", "nombre": "$nombre"}, "copias": {"$sum": 1}}},
+                {"$match": {"copias": {"$gt": 1}}},
+                {"$limit": 10},
+            ])
+        ]
+
+    def cerrar(self) -> None:
+        self.client.close()
+
+    def get_cuadrilla(self, grupo: str) -> list[dict[str, Any]] | None:
+        cuadrilla = self.cuadrillas.find_one({"grupo": grupo}, {"_id": 0, "personas": 1})
+        return cuadrilla["personas"] if cuadrilla else None
+
+    def guardar_cuadrilla(self, grupo: str, personas: list[dict[str, Any]]) -> None:
+        self.cuadrillas.update_one({"grupo": grupo}, {"$set": {"personas": personas}}, upsert=True)
+
+    def existe(self, grupo: str, nombre: str) -> bool:
+        return self.barbacoas.find_one({"grupo": grupo, "nombre": nombre}, {"_id": 1}) is not None
+
+    def insertar(self, grupo: str, barbacoa: dict[str, Any]) -> None:
+        # insert_one añade el _id al diccionario, trabajamos sobre una copia
+        try:
+            self.barbacoas.insert_one(dict(barbacoa, grupo=grupo))
+        except DuplicateKeyError as e:
+            raise NombreDuplicado(barbacoa["nombre"]) from e
+
+    def existentes(self, grupo: str, nombres: list[str]) -> set[str]:
+        return {
+            b["nombre"]
+            for b in self.barbacoas.find({"grupo": grupo, "nombre": {"$in": nombres}}, {"_id": 0, "nombre": 1})
+        }
+
+    def insertar_varias(self, grupo: str, barbacoas: list[dict[str, Any]]) -> set[int]:
+        try:
+            self.barbacoas.insert_many([dict(b, grupo=grupo) for b in barbacoas], ordered=False)
+        except BulkWriteError as e:
+            return {error["index"] for error in e.details.get("writeErrors", [])}
+        return set()
+
+    def eliminar(self, grupo: str, nombre: str) -> dict[str, Any] | None:
+        return self.barbacoas.find_one_and_delete({"grupo": grupo, "nombre": nombre}, SIN_INTERNOS)
+
+    def listar(self, grupo: str) -> list[dict[str, Any]]:
+        return list(self.barbacoas.find({"grupo": grupo}, SIN_INTERNOS).sort("_id", 1))
+
+    def _filtro_pagina(self, grupo: str, despues: str | None) -> dict[str, Any]:
+        filtro: dict[str, Any] = {"grupo": grupo}
+        if despues:
+            try:
+                filtro["_id"] = {"$gt": ObjectId(despues)}
+            except InvalidId:
+                raise ValueError("Cursor no válido.")
+        return filtro
+
+    def resumen(
+            self, grupo: str, limite: int, despues: str | None = None
+            ) -> tuple[list[dict[str, Any]], str | None]:
+        filtro = self._filtro_pagina(grupo, despues)
+        cursor = self.barbacoas.find(filtro, {"nombre": 1, "fecha": 1}).sort("_id", 1).limit(limite)
+        barbacoas = [
+            {"id": str(b["_id"]), "nombre": b.get("nombre"), "fecha": b.get("fecha")}
+            for b in cursor
+        ]
+        siguiente = barbacoas[-1]["id"] if len(barbacoas) == limite else None
+        return barbacoas, siguiente
+
+    def lote(
+            self, grupo: str, limite: int, despues: str | None = None
+            ) -> tuple[list[dict[str, Any]], str | None]:
+        filtro = self._filtro_pagina(grupo, despues)
+        barbacoas = list(self.barbacoas.find(filtro, {"grupo": 0}).sort("_id", 1).limit(limite))
+        siguiente = str(barbacoas[-1]["_id"]) if len(barbacoas) == limite else None
+        for barbacoa in barbacoas:
+            del barbacoa["_id"]
+        return barbacoas, siguiente
+
+    def detalle(self, grupo: str, nombre: str) -> dict[str, Any] | None:
+        return self.barbacoas.find_one({"grupo": grupo, "nombre": nombre}, SIN_INTERNOS)
+
+    def listar_ajustes(self, grupo: str) -> list[list[dict[str, Any]]]:
+        return [b.get("ajustes", []) for b in self.barbacoas.find({"grupo": grupo}, {"_id": 0, "ajustes": 1})]
+
+    def get_saldos(self, grupo: str) -> dict[str, int]:
+        return {
+            s["nombre"]: s["saldo"]
+            for s in self.saldos.find({"grupo": grupo, "saldo": {"$ne": 0}}, {"_id": 0})
+        }
+
+    def actualizar_saldos(self, grupo: str, variacion: dict[str, int]) -> None:
+        operaciones = [
+            UpdateOne({"grupo": grupo, "nombre": persona}, {"$inc": {"saldo": centimos}}, upsert=True)
+            for persona, centimos in variacion.items() if centimos
+        ]
+        if operaciones:
+            self.saldos.bulk_write(operaciones, ordered=False)
+
+    def estadisticas(self, grupo: str) -> dict[str, Any]:
+        # Un solo viaje al servidor: cada faceta es una agregación sobre las barbacoas del grupo
+        # Últimos cuatro caracteres de la fecha dd-mm-aaaa, como año_barbacoa
+        año = {"$substrCP": ["$fecha", {"$max": [0, {"$subtract": [{"$strLenCP": "$fecha"}, 4]}]}, 4]}
+        facetas = next(self.barbacoas.aggregate([
+            {"$match": {"grupo": grupo}},
+            {"$facet": {
+                "totales": [
+                    {"$group": {"_id": None, "barbacoas": {"$sum": 1}, "gasto_total": {"$sum": "$gasto_total"}}},
+                ],
+                "pagado": [
+                    {"$unwind": "$gastos"},
+                    {"$group": {"_id": "$gastos.Persona", "pagado": {"$sum": "$gastos.Importe"}}},
+                ],
+                "asistencias": [
+                    {"$unwind": "$participantes"},
+                    {"$group": {"_id": "$participantes", "asistencias": {"$sum": 1}}},
+                ],
+                "por_año": [
+                    {"$match": {"fecha": {"$type": "string"}}},
+                    {"$group": {"_id": año, "barbacoas": {"$sum": 1}, "gasto_total": {"$sum": "$gasto_total"}}},
+                ],
+            }},
+        ]))
+        totales = facetas["totales"][0] if facetas["totales"] else {"barbacoas": 0, "gasto_total": 0.0}
+        return {
+            "barbacoas": totales["barbacoas"],
+            "gasto_total": totales["gasto_total"],
+            "pagado": {p["_id"]: p["pagado"] for p in facetas["pagado"]},
+            "asistencias": {a["_id"]: a["asistencias"] for a in facetas["asistencias"]},
+            "por_año": {
+                a["_id"]: {"barbacoas": a["barbacoas"], "gasto_total": a["gasto_total"]} for a in facetas["por_año"]
+            },
+        }
+
+    def reemplazar_saldos(self, grupo: str, saldos: dict[str, int]) -> None:
+        self.saldos.delete_many({"grupo": grupo})
+        if saldos:
+            self.saldos.insert_many([{"grupo": grupo, "nombre": p, "saldo": c} for p, c in saldos.items()])
+
+    def get_version(self, grupo: str) -> int:
+        version = self.versiones.find_one({"grupo": grupo}, {"_id": 0, "version": 1})
+        return version["version"] if version else 0
+
+    def incrementar_version(self, grupo: str) -> None:
+        self.versiones.update_one({"grupo": grupo}, {"$inc": {"version": 1}}, upsert=True)
+
+    def publicar_evento(self, grupo: str, evento: dict[str, Any]) -> int:
+        # El número se reserva de forma atómica; entre la reserva y la inserción
+        # otro proceso puede publicar el siguiente, quien lee los eventos lo tiene en cuenta
+        numero = self.versiones.find_one_and_update(
+            {"grupo": grupo}, {"$inc": {"eventos": 1}},
+            projection={"_id": 0, "eventos": 1}, upsert=True, return_document=ReturnDocument.AFTER,
+        )["eventos"]
+        self.eventos_grupo.insert_one({"grupo": grupo, "id": numero, "evento": evento})
+        self.eventos_grupo.delete_many({"grupo": grupo, "id": {"$lte": numero - settings.CAMBIOS_EVENTOS_MAX}})
+        return numero
+
+    def eventos(self, grupo: str, despues: int, limite: int = 500) -> list[tuple[int, dict[str, Any]]]:
+        cursor = self.eventos_grupo.find({"grupo": grupo, "id": {"$gt": despues}}, {"_id": 0, "grupo": 0})
+        return [(e["id"], e["evento"]) for e in cursor.sort("id", 1).limit(limite)]
+
+    def ultimo_evento(self, grupo: str) -> int:
+        contadores = self.versiones.find_one({"grupo": grupo}, {"_id": 0, "eventos": 1})
+        return contadores.get("eventos", 0) if contadores else 0
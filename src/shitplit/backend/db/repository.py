@@ -0,0 +1,182 @@
+"""
+Acceso asíncrono a las barbacoas guardadas.
+
+Los almacenamientos son síncronos (pymongo, sqlite3), así que cada operación
+se ejecuta en un pool de hilos acotado para no bloquear el bucle de eventos
+de uvicorn.
+"""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, TypeVar
+
+from src.shitplit.backend import metrics, profiling
+from src.shitplit.backend.db.storage import BarbacoaStore
+import src.shitplit.settings as settings
+
+T = TypeVar("T")
+
+
+class BarbacoaRepository:
+    def __init__(
+            self,
+            store: BarbacoaStore,
+            max_workers: int = settings.DB_WORKERS,
+            reintentos: int = settings.DB_REINTENTOS
+            ) -> None:
+        self.store = store
+        self.reintentos = reintentos
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="db")
+
+    async def _ejecutar(self, operacion: str, func: Callable[..., T], *args: Any, reintentar: bool = False) -> T:
+        """
+        Ejecuta una operación del almacenamiento en el pool de hilos y mide
+        su latencia con la etiqueta operacion (find, insert, delete, update, aggregate).
+        Las lecturas se reintentan ante errores transitorios.
+        """
+        loop = asyncio.get_running_loop()
+        intentos = self.reintentos + 1 if reintentar else 1
+        for intento in range(intentos):
+            try:
+                with metrics.latencia_almacenamiento.medir(operacion), profiling.medir("almacenamiento"):
+                    return await loop.run_in_executor(self.executor, functools.partial(func, *args))
+            except self.store.errores_transitorios:
+                if intento == intentos - 1:
+                    raise
+                await asyncio.sleep(settings.DB_ESPERA_REINTENTO * 2 ** intento)
+
+    async def ping(self) -> None:
+        await self._ejecutar("ping", self.store.ping)
+
+    async def crear_indices(self) -> None:
+        await self._ejecutar("indices", self.store.crear_indices)
+
+    def cerrar(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.store.cerrar()
+
+    async def get_cuadrilla(self, grupo: str) -> list[dict[str, Any]] | None:
+        return await self._ejecutar("find", self.store.get_cuadrilla, grupo, reintentar=True)
+
+    async def guardar_cuadrilla(self, grupo: str, personas: list[dict[str, Any]]) -> None:
+        await self._ejecutar("update", self.store.guardar_cuadrilla, grupo, personas)
+
+    async def existe(self, grupo: str, nombre: str) -> bool:
+        return await self._ejecutar("find", self.store.existe, grupo, nombre, reintentar=True)
+
+    async def insertar(self, grupo: str, barbacoa: dict[str, Any]) -> None:
+        try:
+            await self._ejecutar("insert", self.store.insertar, grupo, barbacoa)
+        finally:
+            await self._modificado(grupo)
+
+    async def existentes(self, grupo: str, nombres: list[str]) -> set[str]:
+        return await self._ejecutar("find", self.store.existentes, grupo, nombres, reintentar=True)
+
+    async def insertar_varias(self, grupo: str, barbacoas: list[dict[str, Any]]) -> set[int]:
+        """
+        Inserción masiva sin orden. Devuelve las posiciones que han fallado.
+        """
+        try:
+            return await self._ejecutar("insert", self.store.insertar_varias, grupo, barbacoas)
+        finally:
+            await self._modificado(grupo)
+
+    async def eliminar(self, grupo: str, nombre: str) -> dict[str, Any] | None:
+        """
+        Elimina la barbacoa y la devuelve, o None si no existía.
+        """
+        try:
+            return await self._ejecutar("delete", self.store.eliminar, grupo, nombre)
+        finally:
+            await self._modificado(grupo)
+
+    async def listar(self, grupo: str) -> list[dict[str, Any]]:
+        return await self._ejecutar("find", self.store.listar, grupo, reintentar=True)
+
+    async def resumen(
+            self, grupo: str, limite: int, despues: str | None = None
+            ) -> tuple[list[dict[str, Any]], str | None]:
+        """
+        Página de nombre y fecha de las barbacoas en orden de guardado.
+        Devuelve también el cursor de la página siguiente.
+        Lanza ValueError si el cursor no es válido.
+        """
+        return await self._ejecutar("find", self.store.resumen, grupo, limite, despues, reintentar=True)
+
+    async def recorrer(self, grupo: str, tam_lote: int) -> AsyncIterator[list[dict[str, Any]]]:
+        """
+        Recorre todas las barbacoas por lotes, sin tener nunca más de uno en memoria.
+        """
+        siguiente = None
+        while True:
+            barbacoas, siguiente = await self._ejecutar(
+                "find", self.store.lote, grupo, tam_lote, siguiente, reintentar=True
+            )
+            if barbacoas:
+                yield barbacoas
+            if not siguiente:
+                return
+
+    async def detalle(self, grupo: str, nombre: str) -> dict[str, Any] | None:
+        return await self._ejecutar("find", self.store.detalle, grupo, nombre, reintentar=True)
+
+    async def listar_ajustes(self, grupo: str) -> list[list[dict[str, Any]]]:
+        return await self._ejecutar("find", self.store.listar_ajustes, grupo, reintentar=True)
+
+    # Saldos acumulados de todas las barbacoas guardadas del grupo
+    async def get_saldos(self, grupo: str) -> dict[str, int]:
+        return await self._ejecutar("find", self.store.get_saldos, grupo, reintentar=True)
+
+    async def actualizar_saldos(self, grupo: str, variacion: dict[str, int]) -> None:
+        """
+        Suma a los saldos de cada persona su variación en céntimos.
+        """
+        if any(variacion.values()):
+            try:
+                await self._ejecutar("update", self.store.actualizar_saldos, grupo, variacion)
+            finally:
+                await self._modificado(grupo)
+
+    async def reemplazar_saldos(self, grupo: str, saldos: dict[str, int]) -> None:
+        try:
+            await self._ejecutar("update", self.store.reemplazar_saldos, grupo, saldos)
+        finally:
+            await self._modificado(grupo)
+
+    async def reconstruir_saldos(
+            self, grupo: str, calcular: Callable[[list[list[dict[str, Any]]]], dict[str, int]]
+            ) -> None:
+        """
+        Sustituye los saldos por calcular(ajustes de todas las barbacoas),
+        leyendo y escribiendo de una vez donde el almacenamiento lo permite.
+        """
+        try:
+            await self._ejecutar("update", self.store.reconstruir_saldos, grupo, calcular)
+        finally:
+            await self._modificado(grupo)
+
+    async def version(self, grupo: str) -> int:
+        """
+        Versión de los datos del grupo. Sube con cada escritura, hecha desde
+        este proceso o desde cualquier otro con el mismo almacenamiento.
+        """
+        return await self._ejecutar("find", self.store.get_version, grupo, reintentar=True)
+
+    async def _modificado(self, grupo: str) -> None:
+        await self._ejecutar("update", self.store.incrementar_version, grupo)
+
+    async def publicar_evento(self, grupo: str, evento: dict[str, Any]) -> int:
+        return await self._ejecutar("insert", self.store.publicar_evento, grupo, evento)
+
+    async def eventos(self, grupo: str, despues: int) -> list[tuple[int, dict[str, Any]]]:
+        """
+        Eventos de cambio del grupo posteriores al número despues.
+        """
+        return await self._ejecutar("find", self.store.eventos, grupo, despues, reintentar=True)
+
+    async def ultimo_evento(self, grupo: str) -> int:
+        return await self._ejecutar("find", self.store.ultimo_evento, grupo, reintentar=True)
+
+    async def estadisticas(self, grupo: str) -> dict[str, Any]:
+        return await self._ejecutar("aggregate", self.store.estadisticas, grupo, reintentar=True)
@@ -0,0 +1,290 @@
+"""
+Almacenamiento de las barbacoas en un fichero SQLite embebido.
+Cada barbacoa se guarda como un documento JSON junto a su grupo, nombre y fecha.
+"""
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator
+
+from src.shitplit.backend.db.storage import BarbacoaStore, NombreDuplicado, comprobar_sin_duplicadas
+import src.shitplit.settings as settings
+
+
+def _es_duplicada(error: sqlite3.IntegrityError) -> bool:
+    # Solo el índice único (grupo, nombre): un NOT NULL u otra restricción no es un nombre repetido
+    return "UNIQUE constraint failed: barbacoas.grupo, barbacoas.nombre" in str(error)
+
+
+class SqliteStore(BarbacoaStore):
+    def __init__(self, path: str) -> None:
+        # La conexión se comparte entre los hilos del repositorio, protegida con un lock
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.lock = threading.Lock()
+        with self.lock:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS barbacoas ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, grupo TEXT NOT NULL, nombre TEXT NOT NULL, "
+                "fecha TEXT, documento TEXT NOT NULL)"
+            )
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS saldos ("
+                "grupo TEXT NOT NULL, nombre TEXT NOT NULL, saldo INTEGER NOT NULL, "
+                "PRIMARY KEY (grupo, nombre))"
+            )
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS cuadrillas (grupo TEXT PRIMARY KEY, personas TEXT NOT NULL)"
+            )
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS versiones (grupo TEXT PRIMARY KEY, version INTEGER NOT NULL)"
+            )
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS eventos ("
+                "grupo TEXT NOT NULL, id INTEGER NOT NULL, evento TEXT NOT NULL, PRIMARY KEY (grupo, id))"
+            )
+        self._migrar_grupos()
+
+    @contextmanager
+    def _transaccion(self) -> Iterator[sqlite3.Connection]:
+        """
+        Transacción explícita: la conexión está en autocommit y with self.conn
+        no abriría ninguna. IMMEDIATE bloquea la base de datos para escribir
+        desde el principio, también frente a los demás procesos.
+        """
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.conn
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+
+    def _columnas(self, tabla: str) -> set[str]:
+        return {fila[1] for fila in self.conn.execute(f"PRAGMA table_info({tabla})")}
+
+    def _migrar_grupos(self) -> None:
+        """
+        Las tablas anteriores a los grupos pasan al grupo por defecto.
+        """
+        with self._transaccion():
+            if "grupo" not in self._columnas("barbacoas"):
+                self.conn.execute(
+                    "ALTER TABLE barbacoas ADD COLUMN grupo TEXT NOT NULL DEFAULT ''"
+                )
+                self.conn.execute("UPDATE barbacoas SET grupo = ?", (settings.GRUPO_POR_DEFECTO,))
+            if "grupo" not in self._columnas("saldos"):
+                # La clave primaria cambia, hay que rehacer la tabla
+                self.conn.execute("ALTER TABLE saldos RENAME TO saldos_sin_grupo")
+                self.conn.execute(
+                    "CREATE TABLE saldos (grupo TEXT NOT NULL, nombre TEXT NOT NULL, "
+                    "saldo INTEGER NOT NULL, PRIMARY KEY (grupo, nombre))"
+                )
+                self.conn.execute(
+                    "INSERT INTO saldos SELECT ?, nombre, saldo FROM saldos_sin_grupo",
+                    (settings.GRUPO_POR_DEFECTO,),
+                )
+                self.conn.execute("DROP TABLE saldos_sin_grupo")
+
+    def ping(self) -> None:
+        self._consultar("SELECT 1")
+
+    def crear_indices(self) -> None:
+        with self._transaccion() as conn:
+            conn.execute("DROP INDEX IF EXISTS idx_barbacoas_nombre")
+            # El índice de (grupo, nombre) pasa a ser único
+            if not conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_barbacoas_grupo_nombre_unico'"
+            ).fetchone():
+                comprobar_sin_duplicadas(conn.execute(
+                    "SELECT grupo, nombre FROM barbacoas GROUP BY grupo, nombre HAVING COUNT(*) > 1 LIMIT 10"
+                ).fetchall())
+                conn.execute("DROP INDEX IF EXISTS idx_barbacoas_grupo_nombre")
+                conn.execute("CREATE UNIQUE INDEX idx_barbacoas_grupo_nombre_unico ON barbacoas (grupo, nombre)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_barbacoas_grupo_id ON barbacoas (grupo, id)")
+
+    def cerrar(self) -> None:
+        with self.lock:
+            self.conn.close()
+
+    def _consultar(self, sql: str, parametros: tuple = ()) -> list[tuple]:
+        with self.lock:
+            return self.conn.execute(sql, parametros).fetchall()
+
+    def get_cuadrilla(self, grupo: str) -> list[dict[str, Any]] | None:
+        filas = self._consultar("SELECT personas FROM cuadrillas WHERE grupo = ?", (grupo,))
+        return json.loads(filas[0][0]) if filas else None
+
+    def guardar_cuadrilla(self, grupo: str, personas: list[dict[str, Any]]) -> None:
+        self._consultar(
+            "INSERT INTO cuadrillas (grupo, personas) VALUES (?, ?) "
+            "ON CONFLICT (grupo) DO UPDATE SET personas = excluded.personas",
+            (grupo, json.dumps(personas, ensure_ascii=False)),
+        )
+
+    def existe(self, grupo: str, nombre: str) -> bool:
+        return bool(self._consultar(
+            "SELECT 1 FROM barbacoas WHERE grupo = ? AND nombre = ? LIMIT 1", (grupo, nombre)
+        ))
+
+    @staticmethod
+    def _fila(grupo: str, barbacoa: dict[str, Any]) -> tuple[str, str, str | None, str]:
+        return grupo, barbacoa["nombre"], barbacoa.get("fecha"), json.dumps(barbacoa, ensure_ascii=False)
+
+    def insertar(self, grupo: str, barbacoa: dict[str, Any]) -> None:
+        try:
+            self._consultar(
+                "INSERT INTO barbacoas (grupo, nombre, fecha, documento) VALUES (?, ?, ?, ?)",
+                self._fila(grupo, barbacoa),
+            )
+        except sqlite3.IntegrityError as e:
+            if not _es_duplicada(e):
+                raise
+            raise NombreDuplicado(barbacoa["nombre"]) from e
+
+    def existentes(self, grupo: str, nombres: list[str]) -> set[str]:
+        if not nombres:
+            return set()
+        marcas = ", ".join("?" * len(nombres))
+        return {nombre for (nombre,) in self._consultar(
+            f"SELECT DISTINCT nombre FROM barbacoas WHERE grupo = ? AND nombre IN ({marcas})",
+            (grupo, *nombres),
+        )}
+
+    def insertar_varias(self, grupo: str, barbacoas: list[dict[str, Any]]) -> set[int]:
+        fallidas: set[int] = set()
+        with self._transaccion() as conn:
+            for posicion, barbacoa in enumerate(barbacoas):
+                try:
+                    conn.execute(
+                        "INSERT INTO barbacoas (grupo, nombre, fecha, documento) VALUES (?, ?, ?, ?)",
+                        self._fila(grupo, barbacoa),
+                    )
+                except sqlite3.IntegrityError:
+                    # SQLite deshace solo la sentencia que falla, el resto de la transacción sigue
+                    fallidas.add(posicion)
+        return fallidas
+
+    def eliminar(self, grupo: str, nombre: str) -> dict[str, Any] | None:
+        filas = self._consultar(
+            "DELETE FROM barbacoas WHERE grupo = ? AND nombre = ? RETURNING documento", (grupo, nombre)
+        )
+        return json.loads(filas[0][0]) if filas else None
+
+    def listar(self, grupo: str) -> list[dict[str, Any]]:
+        return [
+            json.loads(d)
+            for (d,) in self._consultar("SELECT documento FROM barbacoas WHERE grupo = ? ORDER BY id", (grupo,))
+        ]
+
+    @staticmethod
+    def _desde(despues: str | None) -> int:
+        try:
+            return int(despues) if despues else 0
+        except ValueError:
+            raise ValueError("Cursor no válido.")
+
+    def resumen(
+            self, grupo: str, limite: int, despues: str | None = None
+            ) -> tuple[list[dict[str, Any]], str | None]:
+        filas = self._consultar(
+            "SELECT id, nombre, fecha FROM barbacoas WHERE grupo = ? AND id > ? ORDER BY id LIMIT ?",
+            (grupo, self._desde(despues), limite),
+        )
+        barbacoas = [{"id": str(id), "nombre": nombre, "fecha": fecha} for id, nombre, fecha in filas]
+        siguiente = barbacoas[-1]["id"] if len(barbacoas) == limite else None
+        return barbacoas, siguiente
+
+    def lote(
+            self, grupo: str, limite: int, despues: str | None = None
+            ) -> tuple[list[dict[str, Any]], str | None]:
+        filas = self._consultar(
+            "SELECT id, documento FROM barbacoas WHERE grupo = ? AND id > ? ORDER BY id LIMIT ?",
+            (grupo, self._desde(despues), limite),
+        )
+        siguiente = str(filas[-1][0]) if len(filas) == limite else None
+        return [json.loads(documento) for _, documento in filas], siguiente
+
+    def detalle(self, grupo: str, nombre: str) -> dict[str, Any] | None:
+        filas = self._consultar(
+            "SELECT documento FROM barbacoas WHERE grupo = ? AND nombre = ? LIMIT 1", (grupo, nombre)
+        )
+        return json.loads(filas[0][0]) if filas else None
+
+    @staticmethod
+    def _leer_ajustes(conn: sqlite3.Connection, grupo: str) -> list[list[dict[str, Any]]]:
+        filas = conn.execute(
+            "SELECT json_extract(documento, '$.ajustes') FROM barbacoas WHERE grupo = ? ORDER BY id", (grupo,)
+        ).fetchall()
+        return [json.loads(ajustes) if ajustes else [] for (ajustes,) in filas]
+
+    def listar_ajustes(self, grupo: str) -> list[list[dict[str, Any]]]:
+        with self.lock:
+            return self._leer_ajustes(self.conn, grupo)
+
+    def get_saldos(self, grupo: str) -> dict[str, int]:
+        return dict(self._consultar("SELECT nombre, saldo FROM saldos WHERE grupo = ? AND saldo != 0", (grupo,)))
+
+    def actualizar_saldos(self, grupo: str, variacion: dict[str, int]) -> None:
+        with self._transaccion() as conn:
+            conn.executemany(
+                "INSERT INTO saldos (grupo, nombre, saldo) VALUES (?, ?, ?) "
+                "ON CONFLICT (grupo, nombre) DO UPDATE SET saldo = saldo + excluded.saldo",
+                [(grupo, persona, centimos) for persona, centimos in variacion.items() if centimos],
+            )
+
+    @staticmethod
+    def _escribir_saldos(conn: sqlite3.Connection, grupo: str, saldos: dict[str, int]) -> None:
+        conn.execute("DELETE FROM saldos WHERE grupo = ?", (grupo,))
+        conn.executemany(
+            "INSERT INTO saldos (grupo, nombre, saldo) VALUES (?, ?, ?)",
+            [(grupo, persona, centimos) for persona, centimos in saldos.items()],
+        )
+
+    def reemplazar_saldos(self, grupo: str, saldos: dict[str, int]) -> None:
+        with self._transaccion() as conn:
+            self._escribir_saldos(conn, grupo, saldos)
+
+    def reconstruir_saldos(
+            self, grupo: str, calcular: Callable[[list[list[dict[str, Any]]]], dict[str, int]]
+            ) -> None:
+        # BEGIN IMMEDIATE: ningún otro proceso escribe entre la lectura y la escritura
+        with self._transaccion() as conn:
+            self._escribir_saldos(conn, grupo, calcular(self._leer_ajustes(conn, grupo)))
+
+    def get_version(self, grupo: str) -> int:
+        filas = self._consultar("SELECT version FROM versiones WHERE grupo = ?", (grupo,))
+        return filas[0][0] if filas else 0
+
+    def incrementar_version(self, grupo: str) -> None:
+        self._consultar(
+            "INSERT INTO versiones (grupo, version) VALUES (?, 1) "
+            "ON CONFLICT (grupo) DO UPDATE SET version = version + 1",
+            (grupo,),
+        )
+
+    def publicar_evento(self, grupo: str, evento: dict[str, Any]) -> int:
+        # Otros procesos no pueden coger el mismo número entre la consulta y la inserción
+        with self._transaccion() as conn:
+            (numero,) = conn.execute(
+                "SELECT COALESCE(MAX(id), 0) + 1 FROM eventos WHERE grupo = ?", (grupo,)
+            ).fetchone()
+            conn.execute(
+                "INSERT INTO eventos (grupo, id, evento) VALUES (?, ?, ?)",
+                (grupo, numero, json.dumps(evento, ensure_ascii=False)),
+            )
+            conn.execute(
+                "DELETE FROM eventos WHERE grupo = ? AND id <= ?", (grupo, numero - settings.CAMBIOS_EVENTOS_MAX)
+            )
+        return numero
+
+    def eventos(self, grupo: str, despues: int, limite: int = 500) -> list[tuple[int, dict[str, Any]]]:
+        filas = self._consultar(
+            "SELECT id, evento FROM eventos WHERE grupo = ? AND id > ? ORDER BY id LIMIT ?", (grupo, despues, limite)
+        )
+        return [(id, json.loads(evento)) for id, evento in filas]
+
+    def ultimo_evento(self, grupo: str) -> int:
+        return self._consultar("SELECT COALESCE(MAX(id), 0) FROM eventos WHERE grupo = ?", (grupo,))[0][0]
@@ -0,0 +1,232 @@
+"""
+Interfaz de almacenamiento de las barbacoas.
+
+Hay tres implementaciones: Mongo (producción), SQLite embebido y memoria,
+para poder arrancar el backend y hacer pruebas de carga sin Mongo.
+Se elige con settings.STORAGE_BACKEND.
+
+Todo está separado por grupo: cada grupo tiene su cuadrilla, sus barbacoas
+y sus saldos, y las consultas de un grupo solo recorren sus datos.
+"""
+from abc import ABC, abstractmethod
+from typing import Any, Callable
+
+import src.shitplit.settings as settings
+
+
+class NombreDuplicado(Exception):
+    """
+    Ya hay una barbacoa con ese nombre en el grupo.
+    """
+
+
+def comprobar_sin_duplicadas(duplicadas: list[tuple[str, str]]) -> None:
+    """
+    Se llama antes de crear el índice único de (grupo, nombre). Si ya hay
+    barbacoas repetidas hay que decidir a mano cuál se queda, así que no se arranca.
+    """
+    if duplicadas:
+        lista = ", ".join(f"{grupo}/{nombre}" for grupo, nombre in duplicadas)
+        raise RuntimeError(
+            f"Hay barbacoas con el nombre repetido en su grupo: {lista}. Elimina las copias "
+            f"en la base de datos y después reconstruye los saldos con {settings.RECONSTRUIR_SALDOS_ENDPOINT}."
+        )
+
+
+class BarbacoaStore(ABC):
+    """
+    Operaciones síncronas sobre las cuadrillas, las barbacoas y los saldos
+    acumulados de cada grupo. El repositorio se encarga de ejecutarlas fuera
+    del bucle de eventos.
+    """
+    # Errores tras los que merece la pena reintentar una lectura
+    errores_transitorios: tuple[type[Exception], ...] = ()
+
+    def ping(self) -> None:
+        """
+        Comprueba que el almacenamiento responde. Lanza una excepción si no.
+        """
+
+    def crear_indices(self) -> None:
+        pass
+
+    def cerrar(self) -> None:
+        pass
+
+    @abstractmethod
+    def get_cuadrilla(self, grupo: str) -> list[dict[str, Any]] | None:
+        """
+        Personas de la cuadrilla del grupo, o None si no tiene.
+        """
+
+    @abstractmethod
+    def guardar_cuadrilla(self, grupo: str, personas: list[dict[str, Any]]) -> None:
+        ...
+
+    @abstractmethod
+    def existe(self, grupo: str, nombre: str) -> bool:
+        ...
+
+    @abstractmethod
+    def insertar(self, grupo: str, barbacoa: dict[str, Any]) -> None:
+        """
+        Lanza NombreDuplicado si el grupo ya tiene una barbacoa con ese nombre.
+        """
+
+    @abstractmethod
+    def existentes(self, grupo: str, nombres: list[str]) -> set[str]:
+        """
+        Cuáles de los nombres están ya guardados, en una sola consulta.
+        """
+
+    @abstractmethod
+    def insertar_varias(self, grupo: str, barbacoas: list[dict[str, Any]]) -> set[int]:
+        """
+        Inserta todas las barbacoas que pueda sin parar en el primer error
+        (p. ej. un nombre repetido). Devuelve las posiciones de las que no se
+        han insertado.
+        """
+
+    @abstractmethod
+    def eliminar(self, grupo: str, nombre: str) -> dict[str, Any] | None:
+        """
+        Elimina la barbacoa y la devuelve, o None si no existía.
+        """
+
+    @abstractmethod
+    def listar(self, grupo: str) -> list[dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def resumen(
+            self, grupo: str, limite: int, despues: str | None = None
+            ) -> tuple[list[dict[str, Any]], str | None]:
+        """
+        Página de id, nombre y fecha de las barbacoas en orden de guardado y
+        cursor de la página siguiente. Lanza ValueError si el cursor no es válido.
+        """
+
+    @abstractmethod
+    def lote(
+            self, grupo: str, limite: int, despues: str | None = None
+            ) -> tuple[list[dict[str, Any]], str | None]:
+        """
+        Como resumen, pero con las barbacoas completas. Sirve para recorrer
+        todo el histórico por partes.
+        """
+
+    @abstractmethod
+    def detalle(self, grupo: str, nombre: str) -> dict[str, Any] | None:
+        ...
+
+    @abstractmethod
+    def listar_ajustes(self, grupo: str) -> list[list[dict[str, Any]]]:
+        ...
+
+    @abstractmethod
+    def get_saldos(self, grupo: str) -> dict[str, int]:
+        """
+        Saldos distintos de cero en céntimos.
+        """
+
+    @abstractmethod
+    def actualizar_saldos(self, grupo: str, variacion: dict[str, int]) -> None:
+        """
+        Suma a los saldos de cada persona su variación en céntimos.
+        """
+
+    @abstractmethod
+    def reemplazar_saldos(self, grupo: str, saldos: dict[str, int]) -> None:
+        ...
+
+    def reconstruir_saldos(
+            self, grupo: str, calcular: Callable[[list[list[dict[str, Any]]]], dict[str, int]]
+            ) -> None:
+        """
+        Sustituye los saldos del grupo por calcular(ajustes de todas sus barbacoas).
+        Esta versión lee y escribe por separado, así que una barbacoa guardada
+        o eliminada entre medias puede quedar contada dos veces o ninguna: hay
+        que hacerlo sin escrituras en el grupo. SQLite y memoria lo hacen en
+        una sola transacción.
+        """
+        self.reemplazar_saldos(grupo, calcular(self.listar_ajustes(grupo)))
+
+    @abstractmethod
+    def get_version(self, grupo: str) -> int:
+        """
+        Contador de escrituras del grupo, compartido por todos los procesos
+        que usan el mismo almacenamiento. 0 si nunca se ha escrito.
+        """
+
+    @abstractmethod
+    def incrementar_version(self, grupo: str) -> None:
+        ...
+
+    @abstractmethod
+    def publicar_evento(self, grupo: str, evento: dict[str, Any]) -> int:
+        """
+        Guarda un evento de cambio del grupo con el siguiente número de su
+        secuencia y lo devuelve. Solo se conservan los últimos
+        settings.CAMBIOS_EVENTOS_MAX.
+        """
+
+    @abstractmethod
+    def eventos(self, grupo: str, despues: int, limite: int = 500) -> list[tuple[int, dict[str, Any]]]:
+        """
+        Eventos del grupo con número mayor que despues, en orden.
+        """
+
+    @abstractmethod
+    def ultimo_evento(self, grupo: str) -> int:
+        ...
+
+    def estadisticas(self, grupo: str) -> dict[str, Any]:
+        """
+        Agregados del histórico del grupo: número de barbacoas y gasto total,
+        lo pagado y las asistencias de cada persona y los totales por año.
+        Esta versión recorre el histórico por lotes; Mongo lo hace en el servidor.
+        """
+        resultado: dict[str, Any] = {
+            "barbacoas": 0, "gasto_total": 0.0, "pagado": {}, "asistencias": {}, "por_año": {},
+        }
+        pagado, asistencias, por_año = resultado["pagado"], resultado["asistencias"], resultado["por_año"]
+        despues = None
+        while True:
+            barbacoas, despues = self.lote(grupo, settings.EXPORTAR_LOTE, despues)
+            for barbacoa in barbacoas:
+                resultado["barbacoas"] += 1
+                resultado["gasto_total"] += barbacoa.get("gasto_total", 0)
+                for gasto in barbacoa.get("gastos", []):
+                    pagado[gasto["Persona"]] = pagado.get(gasto["Persona"], 0) + gasto["Importe"]
+                for persona in barbacoa.get("participantes", []):
+                    asistencias[persona] = asistencias.get(persona, 0) + 1
+                if isinstance(barbacoa.get("fecha"), str):
+                    año = por_año.setdefault(año_barbacoa(barbacoa["fecha"]), {"barbacoas": 0, "gasto_total": 0.0})
+                    año["barbacoas"] += 1
+                    año["gasto_total"] += barbacoa.get("gasto_total", 0)
+            if not despues:
+                return resultado
+
+
+def año_barbacoa(fecha: str) -> str:
+    """
+    Año de una fecha dd-mm-aaaa (el formato del frontend).
+    """
+    return fecha[-4:]
+
+
+def crear_store(tipo: str = settings.STORAGE_BACKEND) -> BarbacoaStore:
+    """
+    Crea el almacenamiento configurado. Los módulos se importan aquí para no
+    cargar pymongo si no se usa Mongo.
+    """
+    if tipo == "mongo":
+        from src.shitplit.backend.db.mongo_store import MongoStore
+        return MongoStore()
+    if tipo == "sqlite":
+        from src.shitplit.backend.db.sqlite_store import SqliteStore
+        return SqliteStore(settings.SQLITE_PATH)
+    if tipo == "memoria":
+        from src.shitplit.backend.db.memory_store import MemoryStore
+        return MemoryStore()
+    raise ValueError(f"Almacenamiento desconocido: {tipo}")
@@ -0,0 +1,79 @@
+"""
+Estadísticas del histórico de cada grupo.
+
+Los agregados los calcula el almacenamiento (en Mongo con pipelines de
+agregación) y aquí se componen con los saldos. El resultado se reutiliza
+hasta la siguiente escritura en el grupo, o como mucho ESTADISTICAS_TTL.
+"""
+import time
+from typing import Any
+
+from src.shitplit.backend.db.repository import BarbacoaRepository
+import src.shitplit.settings as settings
+
+
+def _medio(total: float, veces: int) -> float | None:
+    return round(total / veces, 2) if veces else None
+
+
+def componer(agregados: dict[str, Any], saldos: dict[str, int]) -> dict[str, Any]:
+    """
+    Respuesta de estadísticas a partir de los agregados del almacenamiento y
+    los saldos en céntimos.
+    """
+    pagado, asistencias = agregados["pagado"], agregados["asistencias"]
+    personas = [
+        {
+            "nombre": persona,
+            "pagado": round(float(pagado.get(persona, 0)), 2),
+            "asistencias": asistencias.get(persona, 0),
+            "pagado_medio": _medio(pagado.get(persona, 0), asistencias.get(persona, 0)),
+        }
+        for persona in dict.fromkeys([*pagado, *asistencias])
+    ]
+    personas.sort(key=lambda p: p["pagado"], reverse=True)
+
+    acreedor = max(saldos.items(), key=lambda s: s[1], default=None)
+    deudor = min(saldos.items(), key=lambda s: s[1], default=None)
+    return {
+        "barbacoas": agregados["barbacoas"],
+        "gasto_total": round(float(agregados["gasto_total"]), 2),
+        "gasto_medio": _medio(agregados["gasto_total"], agregados["barbacoas"]),
+        "personas": personas,
+        "por_año": [
+            {
+                "año": año,
+                "barbacoas": datos["barbacoas"],
+                "gasto_total": round(float(datos["gasto_total"]), 2),
+                "gasto_medio": _medio(datos["gasto_total"], datos["barbacoas"]),
+            }
+            for año, datos in sorted(agregados["por_año"].items())
+        ],
+        "mayor_acreedor": (
+            {"nombre": acreedor[0], "saldo": acreedor[1] / 100} if acreedor and acreedor[1] > 0 else None
+        ),
+        "mayor_deudor": (
+            {"nombre": deudor[0], "saldo": deudor[1] / 100} if deudor and deudor[1] < 0 else None
+        ),
+    }
+
+
+class CacheEstadisticas:
+    def __init__(self, ttl: float = settings.ESTADISTICAS_TTL) -> None:
+        self.ttl = ttl
+        # Por grupo: versión de los datos, cuándo se calcularon y resultado
+        self.entradas: dict[str, tuple[int, float, dict[str, Any]]] = {}
+
+    async def get(self, repo: BarbacoaRepository, grupo: str) -> dict[str, Any]:
+        version = await repo.version(grupo)
+        entrada = self.entradas.get(grupo)
+        if entrada is not None and entrada[0] == version and time.monotonic() - entrada[1] < self.ttl:
+            return entrada[2]
+
+        resultado = componer(await repo.estadisticas(grupo), await repo.get_saldos(grupo))
+        # Con la versión de antes de calcular: si ha habido una escritura mientras, se recalculará
+        self.entradas[grupo] = (version, time.monotonic(), resultado)
+        return resultado
+
+
+cache_estadisticas = CacheEstadisticas()
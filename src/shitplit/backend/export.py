@@ -0,0 +1,53 @@
+"""
+Exportación del histórico de barbacoas en NDJSON o CSV.
+
+Los generadores reciben los lotes del repositorio y van devolviendo el texto
+de cada uno, de forma que la respuesta se envía por partes y la memoria no
+crece con el tamaño del histórico.
+"""
+import csv
+import io
+import json
+from typing import Any, AsyncIterator, Literal
+
+FormatoExportacion = Literal["ndjson", "csv"]
+# Una fila por gasto o por ajuste en el CSV
+FilasExportacion = Literal["gastos", "ajustes"]
+
+COLUMNAS_CSV = {
+    "gastos": ("barbacoa", "fecha", "persona", "concepto", "importe"),
+    "ajustes": ("barbacoa", "fecha", "deudor", "acreedor", "pago"),
+}
+
+
+async def ndjson(lotes: AsyncIterator[list[dict[str, Any]]]) -> AsyncIterator[str]:
+    async for barbacoas in lotes:
+        yield "".join(json.dumps(b, ensure_ascii=False, default=str) + "\n" for b in barbacoas)
+
+
+def _filas(barbacoa: dict[str, Any], filas: FilasExportacion) -> list[tuple[Any, ...]]:
+    nombre, fecha = barbacoa.get("nombre"), barbacoa.get("fecha")
+    if filas == "gastos":
+        return [
+            (nombre, fecha, g.get("Persona"), g.get("Concepto"), g.get("Importe"))
+            for g in barbacoa.get("gastos", [])
+        ]
+    return [
+        (nombre, fecha, a.get("deudor"), a.get("acreedor"), a.get("pago"))
+        for a in barbacoa.get("ajustes", [])
+    ]
+
+
+async def csv_plano(lotes: AsyncIterator[list[dict[str, Any]]], filas: FilasExportacion) -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNAS_CSV[filas])
+    async for barbacoas in lotes:
+        for barbacoa in barbacoas:
+            writer.writerows(_filas(barbacoa, filas))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # Cabecera sola si no hay barbacoas
+    if buffer.tell():
+        yield buffer.getvalue()
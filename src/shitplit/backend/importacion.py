@@ -0,0 +1,54 @@
+"""
+Lectura de las barbacoas de una importación masiva.
+
+Se aceptan un array JSON o NDJSON (una barbacoa por línea). El NDJSON se lee
+por partes según llega el cuerpo de la petición; el array JSON tiene que
+leerse entero antes de poder recorrerlo.
+"""
+import json
+from typing import Any, AsyncIterator
+
+from fastapi import Request
+
+TIPOS_NDJSON = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+
+class RegistroNoValido(Exception):
+    pass
+
+
+async def _lineas(request: Request) -> AsyncIterator[bytes]:
+    resto = b""
+    async for trozo in request.stream():
+        resto += trozo
+        *lineas, resto = resto.split(b"\n")
+        for linea in lineas:
+            yield linea
+    yield resto
+
+
+async def registros(request: Request) -> AsyncIterator[Any]:
+    """
+    Devuelve cada registro del cuerpo ya decodificado, o un RegistroNoValido
+    en su lugar si no es JSON válido, para poder informar de él y seguir.
+    Lanza ValueError si el cuerpo no es un array JSON válido.
+    """
+    tipo = request.headers.get("content-type", "").split(";")[0].strip()
+    if tipo in TIPOS_NDJSON:
+        async for linea in _lineas(request):
+            if not linea.strip():
+                continue
+            try:
+                yield json.loads(linea)
+            except ValueError as e:
+                yield RegistroNoValido(f"JSON no válido: {e}")
+        return
+
+    try:
+        datos = json.loads(await request.body())
+    except ValueError as e:
+        raise ValueError(f"JSON no válido: {e}")
+    if not isinstance(datos, list):
+        raise ValueError("Se esperaba un array de barbacoas.")
+    for registro in datos:
+        yield registro
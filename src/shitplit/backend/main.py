@@ -1,16 +1,157 @@
-import os
-import json
-from typing import Any
-
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-import pandas as pd
-from icecream import ic
-
-from src.shitplit.backend.db.client import collection
+import asyncio
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, Annotated, Any, Literal
+
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request, Response
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, ConfigDict, NonNegativeFloat, ValidationError
+
+from src.shitplit.backend.db import client
+from src.shitplit.backend.db.client import get_repository
+from src.shitplit.backend.db.repository import BarbacoaRepository
+from src.shitplit.backend.db.storage import NombreDuplicado
+from src.shitplit.backend import cache, export, importacion, metrics, profiling, respuestas, settlement
+from src.shitplit.backend.cambios import cambios_barbacoas
+from src.shitplit.backend.cuadrilla import Cuadrilla, cache_cuadrillas, leer_personas
+from src.shitplit.backend.estadisticas import cache_estadisticas
 import src.shitplit.settings as settings
 
-app = FastAPI()
+if TYPE_CHECKING:
+    from concurrent.futures import ProcessPoolExecutor
+
+# Pool de procesos para los lotes grandes, se crea al primer uso
+pool: "ProcessPoolExecutor | None" = None
+
+def get_pool() -> "ProcessPoolExecutor":
+    global pool
+    if pool is None:
+        # multiprocessing solo se importa si llega un lote grande
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        # Sin fork: este proceso ya tiene hilos (pymongo, el pool del repositorio)
+        pool = ProcessPoolExecutor(
+            max_workers=settings.LOTE_WORKERS, mp_context=multiprocessing.get_context("forkserver")
+        )
+    return pool
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global pool
+    # Con varios workers /metrics suma las métricas de todos
+    if settings.METRICAS_DIR:
+        metrics.registro.compartir(settings.METRICAS_DIR)
+    # Falla aquí, y no en la primera petición, si el almacenamiento no responde
+    repository = await client.conectar()
+    await repository.crear_indices()
+    # El grupo por defecto empieza con la cuadrilla de personas.json
+    if await repository.get_cuadrilla(settings.GRUPO_POR_DEFECTO) is None:
+        await repository.guardar_cuadrilla(settings.GRUPO_POR_DEFECTO, leer_personas(settings.PERSONAS_FILE))
+    yield
+    client.desconectar()
+    metrics.registro.guardar()
+    if pool is not None:
+        pool.shutdown(cancel_futures=True)
+        pool = None
+
+
+app = FastAPI(lifespan=lifespan)
+# Las rutas anotan el tiempo de validación para Server-Timing
+app.router.route_class = profiling.RutaMedida
+
+@app.middleware("http")
+async def medir_peticiones(request: Request, call_next):
+    inicio = time.perf_counter()
+    tiempos = profiling.iniciar_tiempos()
+    # Perfil opcional: cabecera X-Profile: 1 con el token de administración, o por muestreo
+    perfil = profiling.iniciar_perfil(
+        request.headers.get("x-profile"), request.headers.get("x-admin-token"), random.random()
+    )
+    try:
+        response = await call_next(request)
+    finally:
+        if perfil is not None:
+            profiling.terminar_perfil(perfil)
+    # Etiquetamos con la plantilla de la ruta para no crear una serie por URL
+    ruta = getattr(request.scope.get("route"), "path", "sin_ruta")
+    metrics.latencia_peticiones.observar(time.perf_counter() - inicio, request.method, ruta)
+    metrics.peticiones.inc(request.method, ruta, str(response.status_code))
+    if perfil is not None:
+        response.headers["X-Profile-Id"] = await asyncio.to_thread(
+            profiling.buffer_perfiles.guardar, perfil, f"{request.method} {ruta}"
+        )
+    response.headers["Server-Timing"] = profiling.server_timing(tiempos)
+    return response
+
+
+@app.get("/healthz", include_in_schema=False)
+async def healthz():
+    """
+    Liveness: el proceso atiende peticiones.
+    """
+    return {"estado": "ok"}
+
+
+@app.get("/readyz", include_in_schema=False)
+async def readyz():
+    """
+    Readiness: el almacenamiento está conectado y responde.
+    """
+    if client.repository is None:
+        return JSONResponse({"estado": "sin almacenamiento"}, status_code=503)
+    try:
+        await client.repository.ping()
+    except Exception as e:
+        return JSONResponse({"estado": "almacenamiento no disponible", "error": str(e)}, status_code=503)
+    return {"estado": "ok"}
+
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    # Con varios workers lee las instantáneas de los demás del disco
+    return PlainTextResponse(await asyncio.to_thread(metrics.registro.exponer), media_type="text/plain; version=0.0.4")
+
+
+def comprobar_admin(x_admin_token: str | None = Header(None)) -> None:
+    if not profiling.token_valido(x_admin_token):
+        raise HTTPException(status_code=403, detail="Token de administración no válido.")
+
+
+@app.get(settings.PERFILES_ENDPOINT, include_in_schema=False, dependencies=[Depends(comprobar_admin)])
+async def get_perfiles():
+    """
+    Perfiles guardados, del más reciente al más antiguo.
+    """
+    return {"perfiles": await asyncio.to_thread(profiling.buffer_perfiles.listar)}
+
+
+@app.get(settings.PERFILES_ENDPOINT + "/{id}", include_in_schema=False, dependencies=[Depends(comprobar_admin)])
+async def descargar_perfil(id: str):
+    """
+    Descarga un perfil en formato pstats (python -m pstats fichero.prof).
+    """
+    fichero = profiling.buffer_perfiles.fichero(id)
+    if fichero is None:
+        raise HTTPException(status_code=404, detail="El perfil no existe.")
+    return FileResponse(fichero, media_type="application/octet-stream", filename=fichero.name)
+
+# Voraz: empareja por orden. Óptimo: mínimo número de transferencias
+ModoAjuste = Literal["voraz", "optimo"]
+Modo = Annotated[ModoAjuste, Query(description=(
+    "voraz: empareja deudores y acreedores por orden. optimo: mínimo número de transferencias "
+    f"mientras queden como mucho {settings.OPTIMO_MAX_PERSONAS} saldos pendientes tras emparejar "
+    f"los opuestos y la búsqueda termine en {settings.OPTIMO_PRESUPUESTO_MS:g} ms; si no, el voraz."
+))]
+# Grupo al que se refiere la petición; cada uno tiene su cuadrilla, barbacoas y saldos
+Grupo = Annotated[str, Query(min_length=1, max_length=64, pattern=r"^[\w-]+$")]
+
+async def get_cuadrilla_grupo(
+        grupo: Grupo = settings.GRUPO_POR_DEFECTO,
+        repo: BarbacoaRepository = Depends(get_repository)
+        ) -> Cuadrilla:
+    return await cache_cuadrillas.get(repo, grupo)
 
 # Definición del modelo de los gastos
 class Gasto(BaseModel):
@@ -18,6 +159,23 @@ class Gasto(BaseModel):
     Concepto: str
     Importe: float
 
+class GastoCompartido(BaseModel):
+    Persona: str
+    Concepto: str
+    Importe: float
+    # Quién se beneficia del gasto: lista (a partes iguales) o persona -> peso.
+    # Sin beneficiarios se reparte entre todos
+    Beneficiarios: dict[str, NonNegativeFloat] | list[str] | None = None
+
+    def reparto(self) -> dict[str, float] | None:
+        if isinstance(self.Beneficiarios, list):
+            return dict.fromkeys(self.Beneficiarios, 1.0)
+        return self.Beneficiarios
+
+class GastosBarbacoa(BaseModel):
+    nombre: str
+    gastos: list[Gasto]
+
 class BarbacoaMongo(BaseModel):
     fecha: str
     nombre: str
@@ -30,144 +188,395 @@ class BarbacoaMongo(BaseModel):
 class BarbacoaDelete(BaseModel):
     nombre: str
 
-# Cargamos la cuadrilla desde el json
-def load_cuadrilla():
-    if os.path.exists(settings.PERSONAS_FILE):
-        with open(settings.PERSONAS_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    else:
-        return []
+class Persona(BaseModel):
+    # Se guardan también los campos que no usa el backend (hijos...)
+    model_config = ConfigDict(extra="allow")
+
+    nombre: str
+    pareja: str | None = None
+    color: str | None = None
+
+def calcular(
+        gastos: list[tuple[str, float]],
+        parejas: dict[str, str],
+        modo: ModoAjuste,
+        version: str
+        ) -> list[dict[str, Any]]:
+    """
+    Calcula los ajustes, o los saca de la caché si ya se han calculado con los
+    mismos pagos y la misma versión de la cuadrilla. Registra el tiempo del
+    motor, los participantes y las transferencias.
+    """
+    with profiling.medir("calculo"):
+        personas, pagos = settlement.acumular_pagos(gastos)
+        clave = cache.clave_ajustes(zip(personas, pagos), version, modo)
+        ajustes = cache.cache_ajustes.get(clave)
+        if ajustes is None:
+            with metrics.latencia_ajustes.medir(modo):
+                # Los pagos ya sumados dan el mismo resultado que los gastos sueltos
+                ajustes = settlement.calcular_ajustes(
+                    [(persona, centimos / 100) for persona, centimos in zip(personas, pagos)], parejas, modo
+                )
+            cache.cache_ajustes.put(clave, ajustes)
+    metrics.participantes_ajustes.observar(len(personas))
+    metrics.transferencias_ajustes.observar(len(ajustes))
+    return ajustes
 
 
 @app.get(settings.LOAD_CUADRILLA_ENDPOINT)
-async def get_cuadrilla():
-    cuadrilla: list[dict[str, Any]] = load_cuadrilla()
-    return cuadrilla
+async def get_cuadrilla(request: Request, cuadrilla: Cuadrilla = Depends(get_cuadrilla_grupo)):
+    headers = {"ETag": cuadrilla.etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == cuadrilla.etag:
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(cuadrilla.personas, headers=headers)
+
+
+@app.post(settings.GUARDAR_CUADRILLA_ENDPOINT, dependencies=[Depends(comprobar_admin)])
+async def guardar_cuadrilla(
+        personas: list[Persona],
+        grupo: Grupo = settings.GRUPO_POR_DEFECTO,
+        repo: BarbacoaRepository = Depends(get_repository)
+        ):
+    """
+    Crea o sustituye la cuadrilla del grupo.
+    """
+    await repo.guardar_cuadrilla(grupo, [p.model_dump(exclude_unset=True) for p in personas])
+    cache_cuadrillas.invalidar(grupo)
+    return {"message": "ok"}
 
 
 @app.post(settings.CALCULAR_AJUSTES_ENDPOINT)
-async def calcular_ajustes(gastos: list[Gasto]):
-    df = pd.DataFrame([g.model_dump() for g in gastos])
-    total_gasto = df["Importe"].sum()
-    personas = df["Persona"].unique()
-    gasto_medio = total_gasto / len(personas) if len(personas) > 0 else 0
-
-    pagos = df.groupby("Persona")["Importe"].sum().reindex(personas, fill_value=0)
-    deudas = gasto_medio - pagos
-
-    ic(deudas)
-
-    # Calcular deudores y acreedores
-    deudores = deudas[deudas > 0].to_dict()
-    acreedores = (-deudas[deudas < 0]).to_dict()
-
-    ic(deudores)
-    ic(acreedores)
-
-    # Cargar la cuadrilla para acceder a la información de parejas
-    cuadrilla = {persona["nombre"]: persona["pareja"] for persona in load_cuadrilla()}
-
-    ajustes: list[dict[str, Any]] = []
-    for deudor, deuda in deudores.items():
-        pareja_deudor = cuadrilla.get(deudor)
-        # Primero intentamos ajustar con la pareja si es acreedora
-        if pareja_deudor and pareja_deudor in acreedores:
-            credito_pareja = acreedores[pareja_deudor]
-            pago = min(deuda, credito_pareja)
-            ajustes.append({
-                "deudor": deudor,
-                "acreedor": pareja_deudor,
-                "pago": pago
-            })
-            deuda -= pago
-            acreedores[pareja_deudor] -= pago
-            if acreedores[pareja_deudor] == 0:
-                del acreedores[pareja_deudor]
-            if deuda == 0:
-                continue  # Deuda completamente saldada con la pareja, seguimos con el siguiente deudor
-
-        # Si aún hay deuda, ajustamos con otros acreedores
-        for acreedor, credito in list(acreedores.items()):
-            if deuda == 0:
-                break
-            pago = min(deuda, credito)
-            ajustes.append({
-                "deudor": deudor,
-                "acreedor": acreedor,
-                "pago": pago
-            })
-            deuda -= pago
-            acreedores[acreedor] -= pago
-            if acreedores[acreedor] == 0:
-                del acreedores[acreedor]
-
+async def calcular_ajustes(
+        gastos: list[Gasto],
+        modo: Modo = "voraz",
+        cuadrilla: Cuadrilla = Depends(get_cuadrilla_grupo)
+        ):
+    # Parejas de la cuadrilla para darles preferencia en los ajustes
+    ajustes = calcular([(g.Persona, g.Importe) for g in gastos], cuadrilla.parejas, modo, cuadrilla.version)
     return {"ajustes": ajustes}
 
+@app.post(settings.CALCULAR_AJUSTES_LOTE_ENDPOINT)
+async def calcular_ajustes_lote(
+        barbacoas: list[GastosBarbacoa],
+        modo: Modo = "voraz",
+        cuadrilla: Cuadrilla = Depends(get_cuadrilla_grupo)
+        ):
+    # La cuadrilla se consulta una sola vez para todo el lote
+    parejas = cuadrilla.parejas
+    lote = [[(g.Persona, g.Importe) for g in barbacoa.gastos] for barbacoa in barbacoas]
+
+    if len(lote) < settings.LOTE_UMBRAL_PARALELO:
+        resultados = [calcular(gastos, parejas, modo, cuadrilla.version) for gastos in lote]
+    else:
+        # Repartimos el lote en trozos entre los procesos del pool
+        tam = -(-len(lote) // settings.LOTE_WORKERS)
+        loop = asyncio.get_running_loop()
+        with profiling.medir("calculo"):
+            trozos = await asyncio.gather(*(
+                loop.run_in_executor(get_pool(), settlement.calcular_lote, lote[i:i + tam], parejas, modo)
+                for i in range(0, len(lote), tam)
+            ))
+        resultados = [ajustes for trozo in trozos for ajustes in trozo]
+
+    return {
+        "resultados": [
+            {"nombre": barbacoa.nombre, "ajustes": ajustes}
+            for barbacoa, ajustes in zip(barbacoas, resultados)
+        ]
+    }
+
+@app.post(settings.CALCULAR_AJUSTES_COMPARTIDOS_ENDPOINT)
+async def calcular_ajustes_compartidos(
+        gastos: list[GastoCompartido],
+        modo: Modo = "voraz",
+        cuadrilla: Cuadrilla = Depends(get_cuadrilla_grupo)
+        ):
+    """
+    Ajustes cuando cada gasto se reparte solo entre sus beneficiarios,
+    con pesos opcionales (niños, gente que no bebe...).
+    """
+    parejas = cuadrilla.parejas
+    with profiling.medir("calculo"), metrics.latencia_ajustes.medir(f"compartido_{modo}"):
+        try:
+            saldos = settlement.saldos_compartidos([(g.Persona, g.Importe, g.reparto()) for g in gastos])
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        ajustes = settlement.ajustar_saldos(saldos, parejas, modo)
+    metrics.participantes_ajustes.observar(len(saldos))
+    metrics.transferencias_ajustes.observar(len(ajustes))
+    return {
+        "saldos": {persona: centimos / 100 for persona, centimos in saldos.items()},
+        "ajustes": ajustes,
+    }
+
 @app.post("/old")
 async def calcular_ajustes_old(gastos: list[Gasto]):
-    df = pd.DataFrame([g.model_dump() for g in gastos])
-    ic(df)
-    total_gasto = df["Importe"].sum()
-    personas = df["Persona"].unique()
-    gasto_medio = total_gasto / len(personas) if len(personas) > 0 else 0
-
-    pagos = df.groupby("Persona")["Importe"].sum().reindex(personas, fill_value=0)
-    deudas = gasto_medio - pagos
-
-    ic(deudas)
-
-    # Calcular deudores y acreedores
-    deudores = deudas[deudas > 0].to_dict()
-    acreedores = (-deudas[deudas < 0]).to_dict()
-
-    ic(deudores)
-    ic(acreedores)
-
-    ajustes: list[str] = []
-    for deudor, deuda in deudores.items():
-        for acreedor, credito in list(acreedores.items()):
-            if deuda == 0:
-                break
-            pago = min(deuda, credito)
-            transaccion = {
-                "deudor": deudor,
-                "acreedor": acreedor,
-                "pago": pago
-            }
-            ajustes.append(transaccion)
-            deuda -= pago
-            acreedores[acreedor] -= pago
-            if acreedores[acreedor] == 0:
-                del acreedores[acreedor]
-
+    ajustes = calcular([(g.Persona, g.Importe) for g in gastos], {}, "voraz", "sin_parejas")
     return {"ajustes": ajustes}
 
 
 @app.post(settings.GUARDAR_BARBACOA_ENDPOINT)
-async def guardar_barbacoa(barbacoa: BarbacoaMongo):
+async def guardar_barbacoa(
+        barbacoa: BarbacoaMongo,
+        grupo: Grupo = settings.GRUPO_POR_DEFECTO,
+        repo: BarbacoaRepository = Depends(get_repository)
+        ):
     # Convertir el modelo en un diccionario
     barbacoa_dict = barbacoa.model_dump()
-    
+
+    # Comprobar si ya existe una barbacoa con el mismo nombre en el grupo
+    if await repo.existe(grupo, barbacoa_dict["nombre"]):
+        raise HTTPException(status_code=400, detail="Una barbacoa con este nombre ya existe.")
+
     try:
-        # Comprobar si ya existe una barbacoa con el mismo nombre
-        existing_barbacoa = collection.find_one({"nombre": barbacoa_dict["nombre"]})
-        ic(existing_barbacoa)
-        if existing_barbacoa:
-            raise HTTPException(status_code=400, detail="Una barbacoa con este nombre ya existe.")
-        
-        # Insertar la nueva barbacoa si no existe duplicado
-        collection.insert_one(barbacoa_dict)
+        # Insertar la nueva barbacoa si no existe duplicado. El índice único lo
+        # garantiza aunque otra petición haya guardado el mismo nombre después de comprobarlo
+        await repo.insertar(grupo, barbacoa_dict)
+        await repo.actualizar_saldos(grupo, settlement.variacion_saldos(barbacoa_dict["ajustes"]))
+    except NombreDuplicado:
+        raise HTTPException(status_code=400, detail="Una barbacoa con este nombre ya existe.")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    await cambios_barbacoas.publicar(repo, grupo, {
+        "tipo": "insertada",
+        "barbacoa": {"nombre": barbacoa_dict["nombre"], "fecha": barbacoa_dict["fecha"]},
+    })
+
+
+def _rechazada(indice: int, nombre: str | None, motivo: str) -> dict[str, Any]:
+    return {"indice": indice, "nombre": nombre, "estado": "rechazada", "motivo": motivo}
+
+
+async def _importar_lote(
+        repo: BarbacoaRepository,
+        grupo: str,
+        lote: list[tuple[int, dict[str, Any]]]
+        ) -> list[dict[str, Any]]:
+    """
+    Guarda un lote de barbacoas ya validadas: una consulta para los nombres
+    existentes, una inserción masiva y una actualización de los saldos.
+    """
+    existentes = await repo.existentes(grupo, [barbacoa["nombre"] for _, barbacoa in lote])
+    informe = [
+        _rechazada(indice, barbacoa["nombre"], "Una barbacoa con este nombre ya existe.")
+        for indice, barbacoa in lote if barbacoa["nombre"] in existentes
+    ]
+    nuevas = [(indice, barbacoa) for indice, barbacoa in lote if barbacoa["nombre"] not in existentes]
+    if not nuevas:
+        return informe
+
+    fallidas = await repo.insertar_varias(grupo, [barbacoa for _, barbacoa in nuevas])
+    variacion: dict[str, int] = {}
+    for posicion, (indice, barbacoa) in enumerate(nuevas):
+        if posicion in fallidas:
+            informe.append(_rechazada(indice, barbacoa["nombre"], "Error al guardar la barbacoa."))
+            continue
+        informe.append({"indice": indice, "nombre": barbacoa["nombre"], "estado": "aceptada"})
+        for persona, centimos in settlement.variacion_saldos(barbacoa["ajustes"]).items():
+            variacion[persona] = variacion.get(persona, 0) + centimos
+    await repo.actualizar_saldos(grupo, variacion)
+    return informe
+
+
+@app.post(settings.IMPORTAR_BARBACOAS_ENDPOINT)
+async def importar_barbacoas(
+        request: Request,
+        grupo: Grupo = settings.GRUPO_POR_DEFECTO,
+        repo: BarbacoaRepository = Depends(get_repository)
+        ):
+    """
+    Importa muchas barbacoas de una vez, en un array JSON o en NDJSON
+    (Content-Type: application/x-ndjson). Cada registro se valida por separado
+    y se devuelve un informe de los aceptados y los rechazados.
+    """
+    informe: list[dict[str, Any]] = []
+    lote: list[tuple[int, dict[str, Any]]] = []
+    nombres: set[str] = set()
+    indice = -1
+    try:
+        async for registro in importacion.registros(request):
+            indice += 1
+            if isinstance(registro, importacion.RegistroNoValido):
+                informe.append(_rechazada(indice, None, str(registro)))
+                continue
+            try:
+                barbacoa = BarbacoaMongo.model_validate(registro).model_dump()
+            except ValidationError as e:
+                nombre = registro.get("nombre") if isinstance(registro, dict) else None
+                informe.append(_rechazada(indice, nombre, "; ".join(
+                    ": ".join(filter(None, (".".join(map(str, error["loc"])), error["msg"])))
+                    for error in e.errors()
+                )))
+                continue
+            if barbacoa["nombre"] in nombres:
+                informe.append(_rechazada(indice, barbacoa["nombre"], "Nombre repetido en la importación."))
+                continue
+            nombres.add(barbacoa["nombre"])
+            lote.append((indice, barbacoa))
+            if len(lote) >= settings.IMPORTAR_LOTE:
+                informe.extend(await _importar_lote(repo, grupo, lote))
+                lote = []
+        if lote:
+            informe.extend(await _importar_lote(repo, grupo, lote))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        # Aunque el cuerpo esté mal a medias, los lotes anteriores ya se han guardado
+        if any(registro["estado"] == "aceptada" for registro in informe):
+            await cambios_barbacoas.publicar(repo, grupo, {"tipo": "recargar"})
+
+    informe.sort(key=lambda registro: registro["indice"])
+    aceptadas = sum(registro["estado"] == "aceptada" for registro in informe)
+    return {"aceptadas": aceptadas, "rechazadas": len(informe) - aceptadas, "informe": informe}
 
 
 @app.get(settings.OBTENER_BARBACOAS_GUARDADAS_ENDPOINT)
-async def get_barbacoas():
-    barbacoas = list(collection.find({}, {"_id": 0}))
-    return barbacoas
+async def get_barbacoas(
+        request: Request,
+        formato: respuestas.FormatoRespuesta = "completo",
+        grupo: Grupo = settings.GRUPO_POR_DEFECTO,
+        repo: BarbacoaRepository = Depends(get_repository)
+        ):
+    """
+    Todas las barbacoas del grupo. Con formato=compacto los gastos y los
+    ajustes de cada una van por columnas. Responde 304 si no ha cambiado
+    nada desde el ETag de If-None-Match.
+    """
+    headers = respuestas.cabeceras_version(await repo.version(grupo))
+    if respuestas.no_modificada(request, headers):
+        return Response(status_code=304, headers=headers)
+    barbacoas = await repo.listar(grupo)
+    if formato == "compacto":
+        barbacoas = [respuestas.compactar(b) for b in barbacoas]
+    return await respuestas.respuesta_json(request, barbacoas, headers)
+
+
+@app.get(settings.CAMBIOS_BARBACOAS_ENDPOINT)
+async def get_cambios_barbacoas(
+        grupo: Grupo = settings.GRUPO_POR_DEFECTO,
+        last_event_id: str | None = Header(None),
+        repo: BarbacoaRepository = Depends(get_repository)
+        ):
+    """
+    Server-sent events con los cambios en las barbacoas del grupo: insertada,
+    eliminada o recargar (tras una importación, hay que pedir el listado).
+    Con Last-Event-ID se reciben también los perdidos mientras no se escuchaba.
+    """
+    desde = int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+    return StreamingResponse(
+        cambios_barbacoas.sse(repo, grupo, desde),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get(settings.EXPORTAR_BARBACOAS_ENDPOINT)
+async def exportar_barbacoas(
+        formato: export.FormatoExportacion = "ndjson",
+        filas: export.FilasExportacion = "gastos",
+        grupo: Grupo = settings.GRUPO_POR_DEFECTO,
+        repo: BarbacoaRepository = Depends(get_repository)
+        ):
+    """
+    Exporta todo el histórico por partes: en NDJSON una barbacoa por línea,
+    en CSV una fila por gasto o por ajuste según 'filas'.
+    """
+    lotes = repo.recorrer(grupo, settings.EXPORTAR_LOTE)
+    if formato == "csv":
+        return StreamingResponse(
+            export.csv_plano(lotes, filas),
+            media_type="text/csv; charset=utf-8",
+            headers={"Content-Disposition": f'attachment; filename="barbacoas_{filas}.csv"'},
+        )
+    return StreamingResponse(export.ndjson(lotes), media_type="application/x-ndjson")
+
+
+@app.get(settings.RESUMEN_BARBACOAS_ENDPOINT)
+async def get_resumen_barbacoas(
+        request: Request,
+        limite: int = Query(settings.RESUMEN_LIMITE, ge=1, le=settings.RESUMEN_LIMITE_MAX),
+        despues: str | None = None,
+        grupo: Grupo = settings.GRUPO_POR_DEFECTO,
+        repo: BarbacoaRepository = Depends(get_repository)
+        ):
+    """
+    Lista nombre y fecha de las barbacoas en orden de guardado, paginando
+    con el cursor 'siguiente' de la página anterior.
+    """
+    headers = respuestas.cabeceras_version(await repo.version(grupo))
+    if respuestas.no_modificada(request, headers):
+        return Response(status_code=304, headers=headers)
+    try:
+        barbacoas, siguiente = await repo.resumen(grupo, limite, despues)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return await respuestas.respuesta_json(request, {"barbacoas": barbacoas, "siguiente": siguiente}, headers)
+
+
+@app.get(settings.DETALLE_BARBACOA_ENDPOINT)
+async def get_detalle_barbacoa(
+        request: Request,
+        nombre: str,
+        formato: respuestas.FormatoRespuesta = "completo",
+        grupo: Grupo = settings.GRUPO_POR_DEFECTO,
+        repo: BarbacoaRepository = Depends(get_repository)
+        ):
+    headers = respuestas.cabeceras_version(await repo.version(grupo))
+    if respuestas.no_modificada(request, headers):
+        return Response(status_code=304, headers=headers)
+    barbacoa = await repo.detalle(grupo, nombre)
+    if barbacoa is None:
+        raise HTTPException(status_code=404, detail="La barbacoa no existe.")
+    if formato == "compacto":
+        barbacoa = respuestas.compactar(barbacoa)
+    return await respuestas.respuesta_json(request, barbacoa, headers)
 
 
 @app.delete(settings.ELIMINAR_BARBACOA_ENDPOINT)
-async def delete_barbacoa(barbacoa: BarbacoaDelete):
-    collection.delete_one({"nombre": barbacoa.nombre})
-    return {"message": "ok"}
\ No newline at end of file
+async def delete_barbacoa(
+        barbacoa: BarbacoaDelete,
+        grupo: Grupo = settings.GRUPO_POR_DEFECTO,
+        repo: BarbacoaRepository = Depends(get_repository)
+        ):
+    eliminada = await repo.eliminar(grupo, barbacoa.nombre)
+    if eliminada:
+        # Deshacemos sus ajustes en los saldos acumulados
+        await repo.actualizar_saldos(grupo, settlement.variacion_saldos(eliminada.get("ajustes", []), signo=-1))
+        await cambios_barbacoas.publicar(repo, grupo, {"tipo": "eliminada", "nombre": barbacoa.nombre})
+    return {"message": "ok"}
+
+
+@app.get(settings.SALDOS_GLOBALES_ENDPOINT)
+async def get_saldos_globales(
+        modo: Modo = "voraz",
+        grupo: Grupo = settings.GRUPO_POR_DEFECTO,
+        repo: BarbacoaRepository = Depends(get_repository)
+        ):
+    saldos_personas = await repo.get_saldos(grupo)
+    parejas = (await cache_cuadrillas.get(repo, grupo)).parejas
+    return {
+        "saldos": {persona: centimos / 100 for persona, centimos in saldos_personas.items()},
+        "ajustes": settlement.ajustar_saldos(saldos_personas, parejas, modo),
+    }
+
+
+@app.get(settings.ESTADISTICAS_ENDPOINT)
+async def get_estadisticas(grupo: Grupo = settings.GRUPO_POR_DEFECTO, repo: BarbacoaRepository = Depends(get_repository)):
+    """
+    Totales del grupo, lo pagado y las asistencias de cada persona, gasto
+    por año y mayores acreedor y deudor según los saldos acumulados.
+    """
+    return await cache_estadisticas.get(repo, grupo)
+
+
+@app.post(settings.RECONSTRUIR_SALDOS_ENDPOINT, dependencies=[Depends(comprobar_admin)])
+async def reconstruir_saldos(grupo: Grupo = settings.GRUPO_POR_DEFECTO, repo: BarbacoaRepository = Depends(get_repository)):
+    """
+    Recalcula los saldos desde todo el histórico. Solo hace falta para las
+    barbacoas guardadas antes de existir los saldos acumulados o tras
+    arreglar datos a mano. Guardar una barbacoa la inserta y suma sus saldos
+    en dos pasos, y con Mongo la lectura y la escritura van por separado,
+    así que debe lanzarse sin guardados ni eliminaciones en curso en el grupo.
+    """
+    await repo.reconstruir_saldos(grupo, settlement.saldos_historico)
+    return {"message": "ok"}
@@ -0,0 +1,227 @@
+"""
+Métricas del backend en formato de exposición de texto de Prometheus.
+
+Contadores e histogramas mínimos, sin dependencias, seguros entre hilos
+(el repositorio registra desde su pool).
+
+Con varios workers cada proceso tiene sus propios valores y cada scrape llega
+a uno cualquiera. Si hay METRICAS_DIR, cada worker deja ahí una instantánea de
+los suyos cada METRICAS_INTERVALO segundos y /metrics devuelve la suma de
+todas. Las de los workers que ya han terminado se siguen sumando, así que los
+contadores nunca bajan.
+"""
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterator
+
+import src.shitplit.settings as settings
+
+logger = logging.getLogger("shitplit")
+
+# Buckets por defecto de Prometheus, en segundos
+BUCKETS_LATENCIA = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKETS_TAMAÑO = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1_000, 2_000, 5_000, 10_000)
+
+
+def _escapar(valor: str) -> str:
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _etiquetas(nombres: tuple[str, ...], valores: tuple[str, ...], extra: str = "") -> str:
+    pares = [f'{nombre}="{_escapar(valor)}"' for nombre, valor in zip(nombres, valores)]
+    if extra:
+        pares.append(extra)
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+
+def _numero(valor: float) -> str:
+    return str(int(valor)) if float(valor).is_integer() else repr(float(valor))
+
+
+class Contador:
+    def __init__(self, nombre: str, ayuda: str, etiquetas: tuple[str, ...] = ()) -> None:
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = etiquetas
+        self.valores: dict[tuple[str, ...], float] = {}
+        self.lock = threading.Lock()
+
+    def inc(self, *etiquetas: str, valor: float = 1) -> None:
+        with self.lock:
+            self.valores[etiquetas] = self.valores.get(etiquetas, 0) + valor
+
+    def get(self, *etiquetas: str) -> float:
+        return self.valores.get(etiquetas, 0)
+
+    def estado(self) -> list[Any]:
+        with self.lock:
+            return [[list(etiquetas), valor] for etiquetas, valor in self.valores.items()]
+
+    def sumar(self, estado: list[Any]) -> None:
+        for etiquetas, valor in estado:
+            self.inc(*etiquetas, valor=valor)
+
+    def vacia(self) -> "Contador":
+        return Contador(self.nombre, self.ayuda, self.etiquetas)
+
+    def exponer(self) -> list[str]:
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} counter"]
+        with self.lock:
+            for etiquetas, valor in sorted(self.valores.items()):
+                lineas.append(f"{self.nombre}{_etiquetas(self.etiquetas, etiquetas)} {_numero(valor)}")
+        return lineas
+
+
+class Histograma:
+    def __init__(
+            self,
+            nombre: str,
+            ayuda: str,
+            etiquetas: tuple[str, ...] = (),
+            buckets: tuple[float, ...] = BUCKETS_LATENCIA
+            ) -> None:
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = etiquetas
+        self.buckets = buckets
+        # Por cada combinación de etiquetas: cuentas por bucket (no acumuladas), suma y total
+        self.series: dict[tuple[str, ...], tuple[list[int], list[float]]] = {}
+        self.lock = threading.Lock()
+
+    def observar(self, valor: float, *etiquetas: str) -> None:
+        indice = bisect.bisect_left(self.buckets, valor)
+        with self.lock:
+            cuentas, suma = self.series.setdefault(etiquetas, ([0] * (len(self.buckets) + 1), [0.0]))
+            cuentas[indice] += 1
+            suma[0] += valor
+
+    @contextmanager
+    def medir(self, *etiquetas: str) -> Iterator[None]:
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(time.perf_counter() - inicio, *etiquetas)
+
+    def estado(self) -> list[Any]:
+        with self.lock:
+            return [[list(etiquetas), list(cuentas), suma[0]] for etiquetas, (cuentas, suma) in self.series.items()]
+
+    def sumar(self, estado: list[Any]) -> None:
+        with self.lock:
+            for etiquetas, cuentas_otro, suma_otro in estado:
+                cuentas, suma = self.series.setdefault(tuple(etiquetas), ([0] * (len(self.buckets) + 1), [0.0]))
+                for i, cuenta in enumerate(cuentas_otro):
+                    cuentas[i] += cuenta
+                suma[0] += suma_otro
+
+    def vacia(self) -> "Histograma":
+        return Histograma(self.nombre, self.ayuda, self.etiquetas, self.buckets)
+
+    def exponer(self) -> list[str]:
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} histogram"]
+        with self.lock:
+            for etiquetas, (cuentas, suma) in sorted(self.series.items()):
+                acumulado = 0
+                for limite, cuenta in zip(self.buckets + (float("inf"),), cuentas):
+                    acumulado += cuenta
+                    le = "+Inf" if limite == float("inf") else _numero(limite)
+                    bucket = _etiquetas(self.etiquetas, etiquetas, 'le="' + le + '"')
+                    lineas.append(f"{self.nombre}_bucket{bucket} {acumulado}")
+                lineas.append(f"{self.nombre}_sum{_etiquetas(self.etiquetas, etiquetas)} {_numero(suma[0])}")
+                lineas.append(f"{self.nombre}_count{_etiquetas(self.etiquetas, etiquetas)} {acumulado}")
+        return lineas
+
+
+class Registro:
+    def __init__(self) -> None:
+        self.metricas: list[Contador | Histograma] = []
+        # Directorio compartido con los demás workers, si los hay
+        self.directorio: Path | None = None
+        # El pid se puede reutilizar: la instantánea lleva además un id propio
+        self.fichero = f"{os.getpid()}-{uuid.uuid4().hex[:8]}.json"
+
+    def contador(self, *args, **kwargs) -> Contador:
+        metrica = Contador(*args, **kwargs)
+        self.metricas.append(metrica)
+        return metrica
+
+    def histograma(self, *args, **kwargs) -> Histograma:
+        metrica = Histograma(*args, **kwargs)
+        self.metricas.append(metrica)
+        return metrica
+
+    def compartir(self, directorio: Path | str, intervalo: float = settings.METRICAS_INTERVALO) -> None:
+        """
+        Empieza a guardar instantáneas de este proceso en directorio.
+        """
+        if self.directorio is not None:
+            return
+        self.directorio = Path(directorio)
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        self.guardar()
+        threading.Thread(target=self._guardar_cada, args=(intervalo,), name="metricas", daemon=True).start()
+
+    def _guardar_cada(self, intervalo: float) -> None:
+        while True:
+            time.sleep(intervalo)
+            try:
+                self.guardar()
+            except OSError:
+                logger.warning("No se han podido guardar las métricas en %s", self.directorio, exc_info=True)
+
+    def guardar(self) -> None:
+        if self.directorio is None:
+            return
+        # Se escribe aparte y se renombra para que nadie lea un fichero a medias
+        temporal = self.directorio / f".{self.fichero}.tmp"
+        temporal.write_text(json.dumps({metrica.nombre: metrica.estado() for metrica in self.metricas}))
+        os.replace(temporal, self.directorio / self.fichero)
+
+    def _combinadas(self) -> list[Contador | Histograma]:
+        self.guardar()
+        combinadas = [metrica.vacia() for metrica in self.metricas]
+        for fichero in self.directorio.glob("*.json"):
+            try:
+                estados = json.loads(fichero.read_text())
+            except (OSError, ValueError):
+                continue
+            for metrica in combinadas:
+                metrica.sumar(estados.get(metrica.nombre, []))
+        return combinadas
+
+    def exponer(self) -> str:
+        metricas = self.metricas if self.directorio is None else self._combinadas()
+        return "\n".join(linea for metrica in metricas for linea in metrica.exponer()) + "\n"
+
+
+registro = Registro()
+
+peticiones = registro.contador(
+    "shitplit_http_peticiones_total", "Peticiones HTTP atendidas.", ("metodo", "ruta", "estado")
+)
+latencia_peticiones = registro.histograma(
+    "shitplit_http_duracion_segundos", "Latencia de las peticiones HTTP.", ("metodo", "ruta")
+)
+latencia_almacenamiento = registro.histograma(
+    "shitplit_almacenamiento_duracion_segundos", "Latencia de las operaciones de almacenamiento.", ("operacion",)
+)
+latencia_ajustes = registro.histograma(
+    "shitplit_ajustes_duracion_segundos", "Tiempo del motor de ajustes.", ("modo",)
+)
+participantes_ajustes = registro.histograma(
+    "shitplit_ajustes_participantes", "Participantes por cálculo de ajustes.", buckets=BUCKETS_TAMAÑO
+)
+transferencias_ajustes = registro.histograma(
+    "shitplit_ajustes_transferencias", "Transferencias por cálculo de ajustes.", buckets=BUCKETS_TAMAÑO
+)
+cache_ajustes = registro.contador(
+    "shitplit_cache_ajustes_total", "Consultas a la caché de ajustes.", ("resultado",)
+)
@@ -0,0 +1,169 @@
+"""
+Perfilado bajo demanda de peticiones y cabecera Server-Timing.
+
+Una petición se perfila con cProfile si trae la cabecera X-Profile junto con
+el token de administración, o al azar según settings.PERFILES_MUESTREO. Los
+perfiles se guardan en un buffer circular de ficheros .prof en disco. El
+perfil cubre el hilo del bucle de eventos: las operaciones de almacenamiento
+corren en el pool de hilos y solo aparecen como espera, y las demás peticiones
+que se atiendan a la vez en el mismo worker salen también en el perfil. Para
+un perfil limpio hay que pedirlo con poco tráfico.
+
+Además, cada petición acumula el tiempo de validación, almacenamiento y
+cálculo para devolverlo en la cabecera Server-Timing.
+"""
+import asyncio
+import cProfile
+import functools
+import hmac
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+from fastapi.routing import APIRoute
+
+import src.shitplit.settings as settings
+
+# Tiempos de la petición en curso. La entrada "inicio" es el instante en que
+# llegó la petición, el resto son segundos acumulados por fase
+_tiempos: ContextVar[dict[str, float] | None] = ContextVar("tiempos", default=None)
+
+
+def iniciar_tiempos() -> dict[str, float]:
+    tiempos = {"inicio": time.perf_counter()}
+    _tiempos.set(tiempos)
+    return tiempos
+
+
+@contextmanager
+def medir(fase: str) -> Iterator[None]:
+    """
+    Suma la duración del bloque a la fase indicada de la petición en curso.
+    """
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        tiempos = _tiempos.get()
+        if tiempos is not None:
+            tiempos[fase] = tiempos.get(fase, 0.0) + time.perf_counter() - inicio
+
+
+def server_timing(tiempos: dict[str, float]) -> str:
+    total = time.perf_counter() - tiempos["inicio"]
+    fases = [
+        f"{fase};dur={segundos * 1000:.2f}"
+        for fase, segundos in tiempos.items() if fase != "inicio"
+    ]
+    return ", ".join(fases + [f"total;dur={total * 1000:.2f}"])
+
+
+class RutaMedida(APIRoute):
+    """
+    Ruta que anota como validación el tiempo desde que llega la petición hasta
+    que se ejecuta el handler (lectura del cuerpo, validación y dependencias),
+    sin contar lo que las dependencias ya han anotado en otras fases.
+    """
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        # El handler ya está construido sobre self.dependant, así que basta con
+        # envolver la función que llama
+        if asyncio.iscoroutinefunction(self.dependant.call):
+            self.dependant.call = _marcar_validacion(self.dependant.call)
+
+
+def _marcar_validacion(call: Callable[..., Any]) -> Callable[..., Any]:
+    @functools.wraps(call)
+    async def envoltorio(**kwargs: Any) -> Any:
+        tiempos = _tiempos.get()
+        if tiempos is not None:
+            # La cuadrilla de get_cuadrilla_grupo ya cuenta como almacenamiento
+            otras = sum(segundos for fase, segundos in tiempos.items() if fase != "inicio")
+            tiempos["validacion"] = time.perf_counter() - tiempos["inicio"] - otras
+        return await call(**kwargs)
+    return envoltorio
+
+
+class BufferPerfiles:
+    """
+    Guarda los últimos 'maximo' perfiles en un directorio, borrando los más
+    antiguos.
+    """
+    def __init__(self, directorio: Path | str, maximo: int) -> None:
+        self.directorio = Path(directorio)
+        self.maximo = maximo
+        self.lock = threading.Lock()
+
+    def guardar(self, perfil: cProfile.Profile, ruta: str) -> str:
+        # El id empieza por un instante en ns para que el orden alfabético sea el cronológico
+        id = f"{time.time_ns()}-{uuid.uuid4().hex[:8]}"
+        with self.lock:
+            self.directorio.mkdir(parents=True, exist_ok=True)
+            perfil.dump_stats(self.directorio / f"{id}.prof")
+            (self.directorio / f"{id}.ruta").write_text(ruta)
+            for antiguo in self._ids()[:-self.maximo]:
+                for sufijo in (".prof", ".ruta"):
+                    (self.directorio / f"{antiguo}{sufijo}").unlink(missing_ok=True)
+        return id
+
+    def _ids(self) -> list[str]:
+        if not self.directorio.exists():
+            return []
+        return sorted(p.stem for p in self.directorio.glob("*.prof"))
+
+    def listar(self) -> list[dict[str, Any]]:
+        perfiles = []
+        for id in reversed(self._ids()):
+            fichero_ruta = self.directorio / f"{id}.ruta"
+            perfiles.append({
+                "id": id,
+                "ruta": fichero_ruta.read_text() if fichero_ruta.exists() else None,
+                "fecha": int(id.split("-")[0]) / 1e9,
+            })
+        return perfiles
+
+    def fichero(self, id: str) -> Path | None:
+        fichero = self.directorio / f"{id}.prof"
+        # El id no puede salirse del directorio
+        if fichero.parent != self.directorio or not fichero.exists():
+            return None
+        return fichero
+
+
+buffer_perfiles = BufferPerfiles(settings.PERFILES_DIR, settings.PERFILES_MAX)
+
+# cProfile solo admite un perfil activo a la vez por hilo, y todas las
+# peticiones comparten el hilo del bucle de eventos
+_perfil_activo = threading.Lock()
+
+
+def token_valido(token: str | None) -> bool:
+    if not settings.ADMIN_TOKEN or token is None:
+        return False
+    # Comparación en tiempo constante, para no dar pistas del token con la latencia
+    return hmac.compare_digest(token.encode(), settings.ADMIN_TOKEN.encode())
+
+
+def iniciar_perfil(cabecera: str | None, token: str | None, aleatorio: float) -> cProfile.Profile | None:
+    """
+    Empieza a perfilar si la petición lo pide (con token) o le toca por muestreo
+    y no hay otro perfil en marcha. El perfil incluye cualquier otra petición
+    que avance en el bucle de eventos mientras tanto.
+    """
+    pedido = cabecera == "1" and token_valido(token)
+    if not pedido and aleatorio >= settings.PERFILES_MUESTREO:
+        return None
+    if not _perfil_activo.acquire(blocking=False):
+        return None
+    perfil = cProfile.Profile()
+    perfil.enable()
+    return perfil
+
+
+def terminar_perfil(perfil: cProfile.Profile) -> None:
+    perfil.disable()
+    _perfil_activo.release()
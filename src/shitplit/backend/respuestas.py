@@ -0,0 +1,115 @@
+"""
+Formato de las respuestas de barbacoas.
+
+Hay un modo compacto opcional, con los gastos y ajustes de cada barbacoa por
+columnas en lugar de una lista de objetos que repiten las claves en cada
+fila. El JSON se serializa con orjson y se comprime con brotli o gzip según
+el Accept-Encoding del cliente.
+"""
+import asyncio
+import gzip
+from typing import Any, Literal
+
+import brotli
+import orjson
+from fastapi import Request, Response
+
+import src.shitplit.settings as settings
+
+FormatoRespuesta = Literal["completo", "compacto"]
+
+COLUMNAS_GASTOS = ("Persona", "Concepto", "Importe")
+COLUMNAS_AJUSTES = ("deudor", "acreedor", "pago")
+
+# Niveles rápidos: la respuesta se comprime en cada petición
+NIVEL_GZIP = 6
+CALIDAD_BROTLI = 4
+
+
+def _columnas(filas: list[dict[str, Any]], campos: tuple[str, ...]) -> dict[str, list[Any]]:
+    return {campo: [fila.get(campo) for fila in filas] for campo in campos}
+
+
+def compactar(barbacoa: dict[str, Any]) -> dict[str, Any]:
+    """
+    Barbacoa con los gastos y los ajustes por columnas:
+    {"Persona": [...], "Concepto": [...], "Importe": [...]}.
+    """
+    return {
+        **barbacoa,
+        "gastos": _columnas(barbacoa.get("gastos", []), COLUMNAS_GASTOS),
+        "ajustes": _columnas(barbacoa.get("ajustes", []), COLUMNAS_AJUSTES),
+    }
+
+
+def dumps(contenido: Any) -> bytes:
+    return orjson.dumps(contenido)
+
+
+def _aceptadas(cabecera: str | None) -> set[str]:
+    """
+    Codificaciones de Accept-Encoding con q mayor que cero.
+    """
+    aceptadas = set()
+    for parte in (cabecera or "").split(","):
+        nombre, _, parametros = parte.partition(";")
+        q = 1.0
+        parametros = parametros.strip()
+        if parametros.startswith("q="):
+            try:
+                q = float(parametros[2:])
+            except ValueError:
+                q = 0.0
+        if nombre.strip() and q > 0:
+            aceptadas.add(nombre.strip().lower())
+    return aceptadas
+
+
+def codificacion(cabecera: str | None) -> str | None:
+    aceptadas = _aceptadas(cabecera)
+    if "br" in aceptadas:
+        return "br"
+    if "gzip" in aceptadas:
+        return "gzip"
+    return None
+
+
+def _comprimir(cuerpo: bytes, codificacion: str) -> bytes:
+    if codificacion == "br":
+        return brotli.compress(cuerpo, quality=CALIDAD_BROTLI)
+    return gzip.compress(cuerpo, compresslevel=NIVEL_GZIP)
+
+
+def cabeceras_version(version: int) -> dict[str, str]:
+    """
+    ETag débil a partir de la versión de los datos del grupo: vale para
+    cualquier codificación de la misma respuesta.
+    """
+    return {"ETag": f'W/"{version}"', "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+
+
+def no_modificada(request: Request, headers: dict[str, str]) -> bool:
+    """
+    Comparación débil del If-None-Match de la petición con el ETag.
+    """
+    cabecera = request.headers.get("if-none-match")
+    if not cabecera:
+        return False
+    if cabecera.strip() == "*":
+        return True
+    etag = headers["ETag"].removeprefix("W/")
+    return etag in {e.strip().removeprefix("W/") for e in cabecera.split(",")}
+
+
+async def respuesta_json(request: Request, contenido: Any, headers: dict[str, str] | None = None) -> Response:
+    """
+    Respuesta JSON comprimida según lo que acepte el cliente.
+    """
+    cuerpo = dumps(contenido)
+    headers = {**(headers or {}), "Vary": "Accept-Encoding"}
+    elegida = codificacion(request.headers.get("accept-encoding"))
+    if elegida is not None and len(cuerpo) >= settings.COMPRIMIR_MINIMO:
+        # Las listas grandes tardan en comprimirse: fuera del bucle de eventos
+        cuerpo = await asyncio.to_thread(_comprimir, cuerpo, elegida)
+        headers["Content-Encoding"] = elegida
+    return Response(cuerpo, media_type="application/json", headers=headers)
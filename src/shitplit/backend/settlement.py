@@ -0,0 +1,455 @@
+"""
+Motor de ajuste de cuentas de las barbacoas.
+
+Acumula los pagos de cada persona en céntimos enteros y reparte las deudas
+entre deudores y acreedores, dando prioridad a la pareja del deudor.
+Hay dos modos: el voraz, que empareja deudores y acreedores por orden, y el
+óptimo, que busca el mínimo número de transferencias.
+"""
+import time
+from typing import Any, Iterable, Literal
+
+import src.shitplit.settings as settings
+
+
+def acumular_pagos(gastos: Iterable[tuple[str, float]]) -> tuple[list[str], list[int]]:
+    """
+    Suma en céntimos lo que ha pagado cada persona.
+    Devuelve las personas en orden de aparición y sus pagos.
+    """
+    gastos = list(gastos)
+    if len(gastos) >= settings.UMBRAL_NUMPY:
+        return _acumular_pagos_numpy(gastos)
+
+    pagos: dict[str, int] = {}
+    for persona, importe in gastos:
+        pagos[persona] = pagos.get(persona, 0) + round(importe * 100)
+    return list(pagos), list(pagos.values())
+
+
+def _acumular_pagos_numpy(gastos: list[tuple[str, float]]) -> tuple[list[str], list[int]]:
+    """
+    Versión vectorizada de acumular_pagos para entradas grandes.
+    """
+    import numpy as np
+
+    nombres, importes = zip(*gastos)
+    codigos, primeros, inversa = np.unique(
+        np.asarray(nombres, dtype=object), return_index=True, return_inverse=True
+    )
+    centimos = np.rint(np.asarray(importes, dtype=np.float64) * 100).astype(np.int64)
+    pagos = np.zeros(len(codigos), dtype=np.int64)
+    np.add.at(pagos, inversa.ravel(), centimos)
+
+    # np.unique ordena alfabéticamente, recuperamos el orden de aparición
+    orden = np.argsort(primeros, kind="stable")
+    return codigos[orden].tolist(), pagos[orden].tolist()
+
+
+def calcular_deudas(
+        personas: list[str],
+        pagos: list[int]
+        ) -> tuple[dict[str, float], dict[str, float]]:
+    """
+    Calcula lo que debe cada deudor y lo que se le debe a cada acreedor
+    respecto al gasto medio.
+    """
+    if not personas:
+        return {}, {}
+    total_gasto = sum(pagos) / 100
+    gasto_medio = total_gasto / len(personas)
+
+    deudores: dict[str, float] = {}
+    acreedores: dict[str, float] = {}
+    for persona, pago in zip(personas, pagos):
+        deuda = gasto_medio - pago / 100
+        if deuda > 0:
+            deudores[persona] = deuda
+        elif deuda < 0:
+            acreedores[persona] = -deuda
+    return deudores, acreedores
+
+
+def repartir_deudas(
+        deudores: dict[str, float],
+        acreedores: dict[str, float],
+        parejas: dict[str, str] | None = None
+        ) -> list[dict[str, Any]]:
+    """
+    Genera las transferencias entre deudores y acreedores.
+    Cada deudor paga primero a su pareja si es acreedora y después
+    al resto de acreedores en orden.
+    """
+    parejas = parejas or {}
+    pendientes = dict(acreedores)
+    orden = list(acreedores)
+    siguiente = 0
+
+    ajustes: list[dict[str, Any]] = []
+    for deudor, deuda in deudores.items():
+        pareja_deudor = parejas.get(deudor)
+        # Primero intentamos ajustar con la pareja si es acreedora
+        if pareja_deudor and pareja_deudor in pendientes:
+            pago = min(deuda, pendientes[pareja_deudor])
+            ajustes.append({
+                "deudor": deudor,
+                "acreedor": pareja_deudor,
+                "pago": pago
+            })
+            deuda -= pago
+            pendientes[pareja_deudor] -= pago
+            if pendientes[pareja_deudor] == 0:
+                del pendientes[pareja_deudor]
+            if deuda == 0:
+                continue
+
+        # Si aún hay deuda, ajustamos con otros acreedores. Un acreedor solo se
+        # queda a medias cuando el deudor ha saldado su deuda, así que los
+        # anteriores a 'siguiente' ya están saldados
+        while deuda != 0 and siguiente < len(orden):
+            acreedor = orden[siguiente]
+            if acreedor not in pendientes:
+                siguiente += 1
+                continue
+            pago = min(deuda, pendientes[acreedor])
+            ajustes.append({
+                "deudor": deudor,
+                "acreedor": acreedor,
+                "pago": pago
+            })
+            deuda -= pago
+            pendientes[acreedor] -= pago
+            if pendientes[acreedor] == 0:
+                del pendientes[acreedor]
+                siguiente += 1
+
+    return ajustes
+
+
+def calcular_saldos(personas: list[str], pagos: list[int]) -> list[int]:
+    """
+    Calcula el saldo exacto de cada persona en unidades de 1/(100·n) euros,
+    de forma que los saldos son enteros y suman exactamente cero.
+    Positivo si la persona es acreedora y negativo si es deudora.
+    """
+    total = sum(pagos)
+    return [pago * len(personas) - total for pago in pagos]
+
+
+def _emparejar_opuestos(
+        saldos: dict[str, int],
+        parejas: dict[str, str]
+        ) -> list[tuple[str, str, int]]:
+    """
+    Empareja deudores y acreedores con saldos exactamente opuestos, que siempre
+    forman parte de una solución óptima. Las parejas tienen preferencia.
+    Elimina de saldos a las personas emparejadas.
+    """
+    transferencias: list[tuple[str, str, int]] = []
+    for deudor, saldo in list(saldos.items()):
+        pareja = parejas.get(deudor)
+        if saldo < 0 and pareja in saldos and saldos[pareja] == -saldo:
+            transferencias.append((deudor, pareja, -saldo))
+            del saldos[deudor], saldos[pareja]
+
+    acreedores_por_saldo: dict[int, list[str]] = {}
+    for persona, saldo in saldos.items():
+        if saldo > 0:
+            acreedores_por_saldo.setdefault(saldo, []).append(persona)
+    for deudor, saldo in list(saldos.items()):
+        candidatos = acreedores_por_saldo.get(-saldo)
+        if saldo < 0 and candidatos:
+            acreedor = candidatos.pop(0)
+            transferencias.append((deudor, acreedor, -saldo))
+            del saldos[deudor], saldos[acreedor]
+    return transferencias
+
+
+def _grupos_suma_cero(valores: list[int], limite: float) -> list[list[int]] | None:
+    """
+    Particiona los índices de valores (que suman cero) en el máximo número de
+    grupos de suma cero mediante programación dinámica sobre máscaras de bits.
+    dp[mascara] es el máximo número de grupos en los que se puede dividir
+    mascara, contando el propio grupo si suma cero.
+    Devuelve None si se supera el instante límite.
+    """
+    m = len(valores)
+    if m > settings.OPTIMO_MAX_PERSONAS:
+        return None
+    if m > 12:
+        resultado = _tabla_suma_cero_numpy(valores, limite)
+    else:
+        resultado = _tabla_suma_cero(valores, limite)
+    if resultado is None:
+        return None
+    dp, cero = resultado
+
+    # Recorremos la cadena de máscaras desde la completa: los elementos que se
+    # quitan entre dos máscaras de suma cero forman un grupo
+    grupos: list[list[int]] = []
+    actual: list[int] = []
+    mascara = (1 << m) - 1
+    while mascara:
+        objetivo = dp[mascara] - cero[mascara]
+        resto = mascara
+        while resto:
+            bit = resto & -resto
+            resto ^= bit
+            if dp[mascara ^ bit] == objetivo:
+                break
+        actual.append(bit.bit_length() - 1)
+        mascara ^= bit
+        if cero[mascara]:
+            grupos.append(sorted(actual))
+            actual = []
+    return grupos
+
+
+def _tabla_suma_cero(valores: list[int], limite: float) -> tuple[list[int], list[bool]] | None:
+    """
+    Tabla dp para pocos valores, en Python puro.
+    """
+    n = 1 << len(valores)
+    sumas = [0] * n
+    cero = [True] * n
+    dp = [0] * n
+    for mascara in range(1, n):
+        if not mascara & 0xFFF and time.perf_counter() > limite:
+            return None
+        bit = mascara & -mascara
+        sumas[mascara] = sumas[mascara ^ bit] + valores[bit.bit_length() - 1]
+        cero[mascara] = sumas[mascara] == 0
+        mejor = 0
+        resto = mascara
+        while resto:
+            bit = resto & -resto
+            resto ^= bit
+            if dp[mascara ^ bit] > mejor:
+                mejor = dp[mascara ^ bit]
+        dp[mascara] = mejor + cero[mascara]
+    return dp, cero
+
+
+def _tabla_suma_cero_numpy(valores: list[int], limite: float) -> tuple[Any, Any] | None:
+    """
+    Tabla dp vectorizada, calculada por capas de máscaras con el mismo número
+    de bits activos.
+    """
+    import numpy as np
+
+    m = len(valores)
+    n = 1 << m
+    sumas = np.zeros(n, dtype=np.int64)
+    bits = np.zeros(n, dtype=np.int8)
+    for i, valor in enumerate(valores):
+        sumas[1 << i:2 << i] = sumas[:1 << i] + valor
+        bits[1 << i:2 << i] = bits[:1 << i] + 1
+    cero = sumas == 0
+
+    dp = np.zeros(n, dtype=np.int8)
+    mascaras = np.argsort(bits, kind="stable")
+    cortes = np.cumsum(np.bincount(bits, minlength=m + 1))
+    for capa in range(1, m + 1):
+        if time.perf_counter() > limite:
+            return None
+        idx = mascaras[cortes[capa - 1]:cortes[capa]]
+        mejor = np.zeros(len(idx), dtype=np.int8)
+        for i in range(m):
+            # Si el bit no está activo la máscara es de la capa siguiente y
+            # su dp todavía vale cero, así que no altera el máximo
+            np.maximum(mejor, dp[idx ^ (1 << i)], out=mejor)
+        dp[idx] = mejor + cero[idx]
+    return dp, cero
+
+
+def ajustes_optimos(
+        personas: list[str],
+        pagos: list[int],
+        parejas: dict[str, str] | None = None,
+        presupuesto_ms: float | None = None
+        ) -> list[dict[str, Any]] | None:
+    """
+    Calcula los ajustes con el mínimo número de transferencias.
+    Con n saldos distintos de cero particionados en k grupos de suma cero
+    bastan n - k transferencias, así que se busca el máximo número de grupos.
+    Devuelve None si no se encuentra la solución dentro del presupuesto.
+    """
+    saldos = dict(zip(personas, calcular_saldos(personas, pagos)))
+    return _optimizar_saldos(saldos, 100 * len(personas), parejas, presupuesto_ms)
+
+
+def _optimizar_saldos(
+        saldos: dict[str, int],
+        escala: int,
+        parejas: dict[str, str] | None = None,
+        presupuesto_ms: float | None = None
+        ) -> list[dict[str, Any]] | None:
+    """
+    Busca el mínimo número de transferencias para unos saldos enteros que
+    suman cero, expresados en unidades de 1/escala euros.
+    """
+    parejas = parejas or {}
+    if presupuesto_ms is None:
+        presupuesto_ms = settings.OPTIMO_PRESUPUESTO_MS
+    limite = time.perf_counter() + presupuesto_ms / 1000
+
+    saldos = {persona: saldo for persona, saldo in saldos.items() if saldo != 0}
+    transferencias = _emparejar_opuestos(saldos, parejas)
+
+    nombres = list(saldos)
+    grupos = _grupos_suma_cero(list(saldos.values()), limite)
+    if grupos is None:
+        return None
+
+    # Dentro de cada grupo basta con el reparto voraz: cada transferencia salda
+    # al menos a uno y la última salda a los dos
+    for grupo in grupos:
+        miembros = [nombres[i] for i in grupo]
+        deudores = {p: -saldos[p] for p in miembros if saldos[p] < 0}
+        acreedores = {p: saldos[p] for p in miembros if saldos[p] > 0}
+        transferencias.extend(
+            (ajuste["deudor"], ajuste["acreedor"], ajuste["pago"])
+            for ajuste in repartir_deudas(deudores, acreedores, parejas)
+        )
+
+    # Pasamos a euros y descartamos restos de menos de medio céntimo
+    ajustes: list[dict[str, Any]] = []
+    for deudor, acreedor, pago in transferencias:
+        pago_euros = round(pago / escala, 2)
+        if pago_euros > 0:
+            ajustes.append({
+                "deudor": deudor,
+                "acreedor": acreedor,
+                "pago": pago_euros
+            })
+    return ajustes
+
+
+def ajustar_saldos(
+        saldos: dict[str, int],
+        parejas: dict[str, str] | None = None,
+        modo: Literal["voraz", "optimo"] = "voraz"
+        ) -> list[dict[str, Any]]:
+    """
+    Calcula las transferencias que liquidan unos saldos en céntimos
+    (positivo si a la persona le deben dinero).
+    """
+    if modo == "optimo":
+        ajustes = _optimizar_saldos(saldos, 100, parejas)
+        if ajustes is not None:
+            return ajustes
+    # Al ser céntimos enteros el reparto voraz es exacto
+    deudores = {persona: -saldo for persona, saldo in saldos.items() if saldo < 0}
+    acreedores = {persona: saldo for persona, saldo in saldos.items() if saldo > 0}
+    ajustes = repartir_deudas(deudores, acreedores, parejas)
+    for ajuste in ajustes:
+        ajuste["pago"] = ajuste["pago"] / 100
+    return ajustes
+
+
+def variacion_saldos(ajustes: Iterable[dict[str, Any]], signo: int = 1) -> dict[str, int]:
+    """
+    Variación en céntimos de los saldos de cada persona al registrar unos
+    ajustes (signo 1) o al deshacerlos (signo -1).
+    """
+    variacion: dict[str, int] = {}
+    for ajuste in ajustes:
+        pago = signo * round(ajuste["pago"] * 100)
+        variacion[ajuste["acreedor"]] = variacion.get(ajuste["acreedor"], 0) + pago
+        variacion[ajuste["deudor"]] = variacion.get(ajuste["deudor"], 0) - pago
+    return variacion
+
+
+def saldos_historico(historico: Iterable[Iterable[dict[str, Any]]]) -> dict[str, int]:
+    """
+    Saldos en céntimos que dejan los ajustes de todas las barbacoas.
+    """
+    return variacion_saldos(ajuste for ajustes in historico for ajuste in ajustes)
+
+
+def calcular_ajustes(
+        gastos: Iterable[tuple[str, float]],
+        parejas: dict[str, str] | None = None,
+        modo: Literal["voraz", "optimo"] = "voraz",
+        presupuesto_ms: float | None = None
+        ) -> list[dict[str, Any]]:
+    """
+    Calcula los ajustes de una barbacoa a partir de los pares (persona, importe).
+    En modo óptimo, si no da tiempo a encontrar la solución se devuelve la voraz.
+    """
+    personas, pagos = acumular_pagos(gastos)
+    if modo == "optimo":
+        ajustes = ajustes_optimos(personas, pagos, parejas, presupuesto_ms)
+        if ajustes is not None:
+            return ajustes
+    deudores, acreedores = calcular_deudas(personas, pagos)
+    return repartir_deudas(deudores, acreedores, parejas)
+
+
+def saldos_compartidos(
+        gastos: list[tuple[str, float, dict[str, float] | None]]
+        ) -> dict[str, int]:
+    """
+    Saldos en céntimos cuando cada gasto (pagador, importe, beneficiarios) se
+    reparte entre sus beneficiarios en proporción a sus pesos. Sin
+    beneficiarios (None) el gasto se reparte entre todos a partes iguales.
+
+    El reparto es una matriz dispersa pagador×beneficiario que se reduce con
+    bincount a lo pagado y lo consumido por cada persona. Los saldos se
+    redondean a céntimos de forma que sumen exactamente cero. Las personas
+    salen en orden de aparición, primero los pagadores y luego el resto.
+    Lanza ValueError si los pesos de algún gasto no suman más de cero.
+    """
+    import numpy as np
+
+    if not gastos:
+        return {}
+    indices: dict[str, int] = {}
+    pagadores = np.fromiter(
+        (indices.setdefault(persona, len(indices)) for persona, _, _ in gastos), np.int64, len(gastos)
+    )
+    importes = np.rint(np.fromiter((importe for _, importe, _ in gastos), np.float64, len(gastos)) * 100)
+
+    # Entradas de la matriz dispersa en formato coordenado: gasto, beneficiario y peso
+    repartidos = [beneficiarios or {} for _, _, beneficiarios in gastos]
+    entradas = sum(len(beneficiarios) for beneficiarios in repartidos)
+    filas = np.repeat(np.arange(len(gastos)), [len(beneficiarios) for beneficiarios in repartidos])
+    columnas = np.fromiter(
+        (indices.setdefault(persona, len(indices)) for beneficiarios in repartidos for persona in beneficiarios),
+        np.int64, entradas
+    )
+    pesos = np.fromiter(
+        (peso for beneficiarios in repartidos for peso in beneficiarios.values()), np.float64, entradas
+    )
+    n = len(indices)
+
+    entre_todos = np.fromiter((beneficiarios is None for _, _, beneficiarios in gastos), bool, len(gastos))
+    suma_pesos = np.bincount(filas, weights=pesos, minlength=len(gastos))
+    if np.any(suma_pesos[~entre_todos] <= 0):
+        raise ValueError("Los pesos de los beneficiarios de cada gasto deben sumar más de cero.")
+
+    pagado = np.bincount(pagadores, weights=importes, minlength=n)
+    consumido = (
+        np.bincount(columnas, weights=importes[filas] * pesos / suma_pesos[filas], minlength=n)
+        + importes[entre_todos].sum() / n
+    )
+    neto = pagado - consumido
+
+    # Redondeo hacia abajo y el céntimo que falta para cuadrar a los de mayor resto
+    saldos = np.floor(neto)
+    faltan = int(round(-saldos.sum()))
+    saldos[np.argsort(saldos - neto, kind="stable")[:faltan]] += 1
+    return dict(zip(indices, saldos.astype(np.int64).tolist()))
+
+
+def calcular_lote(
+        lote: list[list[tuple[str, float]]],
+        parejas: dict[str, str] | None = None,
+        modo: Literal["voraz", "optimo"] = "voraz"
+        ) -> list[list[dict[str, Any]]]:
+    """
+    Calcula los ajustes de varias barbacoas con la misma cuadrilla.
+    Se usa también como tarea de los procesos del pool, por eso recibe
+    tipos simples.
+    """
+    return [calcular_ajustes(gastos, parejas, modo) for gastos in lote]
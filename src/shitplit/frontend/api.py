@@ -0,0 +1,150 @@
+"""
+Cliente HTTP del frontend para hablar con el backend.
+
+Un único httpx.AsyncClient compartido por todas las sesiones reutiliza las
+conexiones (keep-alive) y aplica tiempos máximos a todas las llamadas.
+Todas las peticiones van al grupo settings.GRUPO.
+"""
+import json
+from typing import Any, AsyncIterator
+
+import httpx
+
+import src.shitplit.settings as settings
+
+_client: httpx.AsyncClient | None = None
+
+# Última cuadrilla recibida y su ETag, para pedirla de forma condicional
+_cuadrilla: list[dict[str, Any]] | None = None
+_cuadrilla_etag: str | None = None
+
+
+def get_client() -> httpx.AsyncClient:
+    """
+    Devuelve el cliente compartido, creándolo la primera vez.
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            base_url=settings.BACKEND_URL,
+            params={"grupo": settings.GRUPO},
+            timeout=httpx.Timeout(settings.FRONTEND_TIMEOUT, connect=settings.FRONTEND_TIMEOUT_CONEXION),
+            limits=httpx.Limits(
+                max_connections=settings.FRONTEND_MAX_CONEXIONES,
+                max_keepalive_connections=settings.FRONTEND_MAX_CONEXIONES,
+            ),
+        )
+    return _client
+
+
+async def get_cuadrilla() -> list[dict[str, Any]] | None:
+    """
+    Personas de la cuadrilla, o None si el backend falla.
+    """
+    global _cuadrilla, _cuadrilla_etag
+    headers = {"If-None-Match": _cuadrilla_etag} if _cuadrilla_etag and _cuadrilla is not None else {}
+    try:
+        response = await get_client().get(settings.LOAD_CUADRILLA_ENDPOINT, headers=headers)
+    except httpx.HTTPError:
+        return None
+    if response.status_code == 304:
+        return _cuadrilla
+    if response.status_code != 200:
+        return None
+    _cuadrilla = response.json()
+    _cuadrilla_etag = response.headers.get("etag")
+    return _cuadrilla
+
+
+async def load_barbacoas_pagina(despues: str | None = None) -> dict[str, Any] | None:
+    """
+    Una página del resumen (nombre y fecha) de las barbacoas guardadas,
+    con el cursor de la siguiente.
+    """
+    params = {"despues": despues} if despues else {}
+    try:
+        response = await get_client().get(settings.RESUMEN_BARBACOAS_ENDPOINT, params=params)
+    except httpx.HTTPError:
+        return None
+    if response.status_code != 200:
+        return None
+    return response.json()
+
+
+async def load_barbacoa(barbacoa_nombre: str) -> dict[str, Any] | None:
+    """
+    Barbacoa completa con sus gastos y ajustes.
+    """
+    try:
+        response = await get_client().get(settings.DETALLE_BARBACOA_ENDPOINT, params={"nombre": barbacoa_nombre})
+    except httpx.HTTPError:
+        return None
+    if response.status_code != 200:
+        return None
+    return response.json()
+
+
+async def delete_barbacoa(barbacoa_nombre: str) -> int:
+    try:
+        response = await get_client().request(
+            "DELETE", settings.ELIMINAR_BARBACOA_ENDPOINT, json={"nombre": barbacoa_nombre}
+        )
+    except httpx.HTTPError:
+        return 503
+    return response.status_code
+
+
+async def calcular_ajustes(gastos: list[dict[str, Any]]) -> list[dict[str, Any]] | None:
+    try:
+        response = await get_client().post(settings.CALCULAR_AJUSTES_ENDPOINT, json=gastos)
+    except httpx.HTTPError:
+        return None
+    if response.status_code != 200:
+        return None
+    return response.json()["ajustes"]
+
+
+async def guardar_barbacoa(barbacoa: dict[str, Any]) -> str | None:
+    """
+    Guarda la barbacoa. Devuelve None si ha ido bien o el mensaje de error.
+    """
+    try:
+        response = await get_client().post(settings.GUARDAR_BARBACOA_ENDPOINT, json=barbacoa)
+    except httpx.HTTPError:
+        return "No se ha podido conectar con el servidor."
+    if response.status_code == 200:
+        return None
+    try:
+        return response.json().get("detail", "Error guardando la barbacoa.")
+    except ValueError:
+        return "Error guardando la barbacoa."
+
+
+async def cambios_barbacoas(ultimo_id: str | None = None) -> AsyncIterator[tuple[str | None, dict[str, Any]]]:
+    """
+    Escucha los server-sent events de cambios en las barbacoas guardadas y
+    devuelve cada evento con su id. Con ultimo_id se reciben también los
+    posteriores a ese que se hayan perdido. Lanza httpx.HTTPError si se corta.
+    """
+    headers = {"Accept": "text/event-stream"}
+    if ultimo_id:
+        headers["Last-Event-ID"] = ultimo_id
+    # El backend manda un latido cada CAMBIOS_LATIDO segundos: si no llega, la conexión está muerta
+    timeout = httpx.Timeout(settings.FRONTEND_TIMEOUT, read=settings.CAMBIOS_LATIDO * 3)
+    async with get_client().stream(
+        "GET", settings.CAMBIOS_BARBACOAS_ENDPOINT, headers=headers, timeout=timeout
+    ) as response:
+        response.raise_for_status()
+        id, datos = None, []
+        async for linea in response.aiter_lines():
+            if not linea:
+                if datos:
+                    yield id, json.loads("\n".join(datos))
+                datos = []
+                continue
+            campo, _, valor = linea.partition(":")
+            valor = valor.removeprefix(" ")
+            if campo == "id":
+                id = valor
+            elif campo == "data":
+                datos.append(valor)
@@ -0,0 +1,90 @@
+"""
+Caché de lecturas compartida por todas las sesiones del frontend.
+
+La cuadrilla y las páginas del listado de barbacoas se piden al backend una
+vez por proceso y se reutilizan durante FRONTEND_CACHE_TTL segundos. Si
+varias sesiones piden lo mismo a la vez solo sale una petición, y las demás
+esperan su resultado. Las sesiones guardan referencias a estos datos, que
+por eso no deben modificarse.
+"""
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Hashable
+
+from src.shitplit.frontend import api
+import src.shitplit.settings as settings
+
+
+class CacheCompartida:
+    def __init__(self, ttl: float = settings.FRONTEND_CACHE_TTL) -> None:
+        self.ttl = ttl
+        self.entradas: dict[Hashable, tuple[float, Any]] = {}
+        # Cargas en curso por clave, para que las peticiones simultáneas esperen la misma
+        self.pendientes: dict[Hashable, asyncio.Task] = {}
+        # Sube al invalidar: las cargas empezadas antes no se guardan
+        self.generacion = 0
+
+    async def get(self, clave: Hashable, cargar: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Valor de la clave, cargándolo con cargar() si no está o ha caducado.
+        None (un error del backend) no se guarda: se devuelve el último valor
+        bueno aunque haya caducado, o None si no hay ninguno.
+        """
+        entrada = self.entradas.get(clave)
+        if entrada is not None and time.monotonic() - entrada[0] < self.ttl:
+            return entrada[1]
+        tarea = self.pendientes.get(clave)
+        if tarea is None:
+            tarea = asyncio.create_task(self._cargar(clave, cargar, self.generacion))
+            self.pendientes[clave] = tarea
+            tarea.add_done_callback(lambda t: self.pendientes.pop(clave) if self.pendientes.get(clave) is t else None)
+        # Si se cancela quien espera, la carga sigue para los demás
+        return await asyncio.shield(tarea)
+
+    async def _cargar(self, clave: Hashable, cargar: Callable[[], Awaitable[Any]], generacion: int) -> Any:
+        valor = await cargar()
+        if valor is None:
+            # La siguiente petición lo vuelve a intentar
+            anterior = self.entradas.get(clave)
+            return anterior[1] if anterior is not None else None
+        if generacion == self.generacion:
+            self.entradas[clave] = (time.monotonic(), valor)
+        return valor
+
+    def invalidar(self) -> None:
+        self.generacion += 1
+        self.entradas.clear()
+        self.pendientes.clear()
+
+
+cache_cuadrilla = CacheCompartida()
+cache_barbacoas = CacheCompartida()
+
+
+async def _cargar_cuadrilla() -> dict[str, Any] | None:
+    personas = await api.get_cuadrilla()
+    if personas is None:
+        return None
+    return {
+        "personas": personas,
+        "colores": {persona["nombre"]: persona["color"] for persona in personas if persona.get("color")},
+    }
+
+
+async def cuadrilla() -> dict[str, Any] | None:
+    """
+    Personas de la cuadrilla y color de cada una: {"personas": [...], "colores": {...}}.
+    None si el backend falla y no se ha cargado nunca.
+    """
+    return await cache_cuadrilla.get("cuadrilla", _cargar_cuadrilla)
+
+
+async def pagina_barbacoas(despues: str | None = None) -> dict[str, Any] | None:
+    """
+    Como api.load_barbacoas_pagina, compartida entre sesiones.
+    """
+    return await cache_barbacoas.get(("resumen", despues), lambda: api.load_barbacoas_pagina(despues))
+
+
+def invalidar_barbacoas() -> None:
+    cache_barbacoas.invalidar()
@@ -0,0 +1,60 @@
+"""
+Cambios en vivo de las barbacoas guardadas para todas las sesiones.
+
+El proceso del frontend mantiene una sola conexión con el feed de cambios del
+backend y reparte cada evento a las sesiones abiertas, que actualizan su
+listado sin volver a descargarlo. Si la conexión se corta se reconecta con
+el último id recibido, así que no se pierde ningún evento.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable
+
+import httpx
+
+from src.shitplit.frontend import api, cache
+from src.shitplit.logs import logger
+
+# Segundos antes de reconectar tras un corte
+ESPERA_RECONEXION = 3
+
+Suscriptor = Callable[[dict[str, Any]], Awaitable[None]]
+
+_suscriptores: set[Suscriptor] = set()
+_tarea: asyncio.Task | None = None
+
+
+async def _escuchar() -> None:
+    ultimo_id = None
+    while _suscriptores:
+        try:
+            async for id, evento in api.cambios_barbacoas(ultimo_id):
+                ultimo_id = id or ultimo_id
+                # Cualquier cambio, de este proceso o de otro, deja viejo el listado compartido
+                cache.invalidar_barbacoas()
+                for suscriptor in list(_suscriptores):
+                    try:
+                        await suscriptor(evento)
+                    except Exception:
+                        logger.exception("Error aplicando un cambio de barbacoas en una sesión")
+        except (httpx.HTTPError, ValueError):
+            logger.warning("Conexión con los cambios de barbacoas cortada, se reintenta")
+        await asyncio.sleep(ESPERA_RECONEXION)
+
+
+def suscribir(suscriptor: Suscriptor) -> None:
+    """
+    Llama a suscriptor con cada evento: {"tipo": "insertada", "barbacoa": {...}},
+    {"tipo": "eliminada", "nombre": ...} o {"tipo": "recargar"}.
+    """
+    global _tarea
+    _suscriptores.add(suscriptor)
+    if _tarea is None or _tarea.done():
+        _tarea = asyncio.create_task(_escuchar())
+
+
+def cancelar(suscriptor: Suscriptor) -> None:
+    global _tarea
+    _suscriptores.discard(suscriptor)
+    if not _suscriptores and _tarea is not None:
+        _tarea.cancel()
+        _tarea = None
@@ -0,0 +1,62 @@
+"""
+Gastos de la barbacoa que se está preparando en la sesión.
+"""
+from typing import Any, Iterator
+
+
+class Gasto:
+    __slots__ = ("id", "persona", "concepto", "importe")
+
+    def __init__(self, id: int, persona: str, concepto: str, importe: float) -> None:
+        self.id = id
+        self.persona = persona
+        self.concepto = concepto
+        self.importe = importe
+
+    def to_dict(self) -> dict[str, Any]:
+        """
+        Formato que espera el backend.
+        """
+        return {"Persona": self.persona, "Concepto": self.concepto, "Importe": self.importe}
+
+
+class LibroGastos:
+    """
+    Gastos indexados por id, de forma que añadir y eliminar son O(1).
+    Lleva el total acumulado en céntimos enteros para no recorrerlos ni
+    arrastrar restos de coma flotante al eliminar.
+    """
+    __slots__ = ("_gastos", "_siguiente_id", "_total_centimos")
+
+    def __init__(self) -> None:
+        self._gastos: dict[int, Gasto] = {}
+        self._siguiente_id = 0
+        self._total_centimos = 0
+
+    @property
+    def total(self) -> float:
+        return self._total_centimos / 100
+
+    def __len__(self) -> int:
+        return len(self._gastos)
+
+    def __iter__(self) -> Iterator[Gasto]:
+        return iter(self._gastos.values())
+
+    def añadir(self, persona: str, concepto: str, importe: float) -> Gasto:
+        gasto = Gasto(self._siguiente_id, persona, concepto, importe)
+        self._gastos[gasto.id] = gasto
+        self._siguiente_id += 1
+        self._total_centimos += round(importe * 100)
+        return gasto
+
+    def eliminar(self, id: int) -> Gasto:
+        gasto = self._gastos.pop(id)
+        self._total_centimos -= round(gasto.importe * 100)
+        return gasto
+
+    def to_records(self) -> list[dict[str, Any]]:
+        return [gasto.to_dict() for gasto in self._gastos.values()]
+
+    def personas(self) -> list[str]:
+        return [gasto.persona for gasto in self._gastos.values()]
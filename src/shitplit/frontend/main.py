@@ -2,50 +2,26 @@ from datetime import datetime
 from typing import Any
 
 import flet as ft
-import pandas as pd
-from icecream import ic
-import requests
 
+from src.shitplit.frontend import api, cache, cambios
+from src.shitplit.frontend.ledger import Gasto, LibroGastos
 from src.shitplit.frontend.styles import Sizes
+from src.shitplit.logs import ic
 import src.shitplit.settings as settings
 
 
-def get_cuadrilla() -> list[dict[str, Any]]:
-    response = requests.get(settings.LOAD_CUADRILLA_URL)
-    if response.status_code != 200:
-        return []
-    return response.json()
-
-# Cargar la lista de barbacoas desde base de datos
-def load_barbacoas() -> list[dict[str, Any]]:
-    """
-    Carga todas las barbacoas de la base de datos MongoDB.
-    Llama a la API
-    """
-    data: list[dict[str, Any]] = requests.get(settings.OBTENER_BARBACOAS_GUARDADAS_URL).json()
-    return data
-
-
-# Eliminar una barbacoa de base de datos
-def delete_barbacoa(barbacoa_nombre: str) -> None:
-    """
-    Elimina una barbacoa de la base de datos MongoDB.
-    Llama a la API
-    """
-    response = requests.delete(settings.ELIMINAR_BARBACOA_URL, json={"nombre": barbacoa_nombre})
-    return response.status_code
-
-
-def main(page: ft.Page):
+async def main(page: ft.Page):
     page.fonts = settings.APP_FONTS
     page.theme = ft.Theme(font_family="Poppins")
     page.title = "Ajustar gastos de barbacoas"
     page.padding = 20
     page.window.icon = "assets/favicon.ico"
     page.scroll = ft.ScrollMode.AUTO
-    page.session.cuadrilla = get_cuadrilla()
-    page.session.colores = {persona['nombre']: persona['color'] for  persona in page.session.cuadrilla}
-    page.session.barbacoas = load_barbacoas()
+    # Referencias a la cuadrilla compartida por todas las sesiones, no copias
+    # Sin backend la sesión empieza con la cuadrilla vacía
+    cuadrilla = await cache.cuadrilla() or {"personas": [], "colores": {}}
+    page.session.cuadrilla = cuadrilla["personas"]
+    page.session.colores = cuadrilla["colores"]
 
     # Variable para almacenar el ancho de la ventana
     window_width = page.window.width
@@ -59,26 +35,44 @@ def main(page: ft.Page):
     # Escuchar el evento de redimensionamiento
     page.on_resized = on_page_resize
 
-    listview_bbq_container = ft.Container(width=420)
-
-    # Contenedor para la tabla
-    def update_expenses_table():
-        expenses_table.rows = [
-            ft.DataRow(cells=[
-                ft.DataCell(ft.Text(row["Persona"], size=Sizes.LARGE)),
-                ft.DataCell(ft.Text(row["Concepto"], size=Sizes.LARGE)),
-                ft.DataCell(ft.Text(f"{row['Importe']:.2f} €", size=Sizes.LARGE)),
-                ft.DataCell(
-                    ft.IconButton(
-                        ft.icons.DELETE, 
-                        on_click=lambda e, idx=index: delete_expense(idx), 
-                        icon_color=ft.colors.RED_700,
-                        tooltip="Eliminar"
-                        )
+    # Listado de barbacoas guardadas. Se pide página a página según se hace
+    # scroll y el ListView solo construye los elementos visibles
+    saved_list_view = ft.ListView(
+        expand=True,
+        spacing=10,
+        on_scroll_interval=100,
+    )
+    barbacoas_siguiente: str | None = None
+    barbacoas_cargando = False
+    barbacoas_completas = False
+    # Sube cada vez que el listado empieza de cero: las páginas pedidas antes se descartan
+    barbacoas_generacion = 0
+    # Elemento del listado de cada barbacoa por nombre, para cambiarlos de uno en uno
+    barbacoa_items: dict[str, ft.Container] = {}
+    listview_bbq_container = ft.Container(saved_list_view, width=420, height=settings.LISTA_BARBACOAS_ALTURA)
+
+    # Filas de la tabla de gastos por id de gasto, para añadir y quitar de una en una
+    expense_rows: dict[int, ft.DataRow] = {}
+
+    def add_expense_row(gasto: Gasto):
+        row = ft.DataRow(cells=[
+            ft.DataCell(ft.Text(gasto.persona, size=Sizes.LARGE)),
+            ft.DataCell(ft.Text(gasto.concepto, size=Sizes.LARGE)),
+            ft.DataCell(ft.Text(f"{gasto.importe:.2f} €", size=Sizes.LARGE)),
+            ft.DataCell(
+                ft.IconButton(
+                    ft.icons.DELETE, 
+                    on_click=lambda e, gasto_id=gasto.id: delete_expense(gasto_id), 
+                    icon_color=ft.colors.RED_700,
+                    tooltip="Eliminar"
                     )
-            ]) for index, row in page.session.expenses.iterrows()
-        ]
-        page.update()
+                )
+        ])
+        expense_rows[gasto.id] = row
+        expenses_table.rows.append(row)
+
+    def remove_expense_row(gasto_id: int):
+        expenses_table.rows.remove(expense_rows.pop(gasto_id))
 
 
     # Botón para añadir el gasto
@@ -92,12 +86,10 @@ def main(page: ft.Page):
             return
 
         if persona:
-            new_expense = pd.DataFrame({"Persona": [persona], "Concepto": [concepto], "Importe": [importe]}, dtype=object)
-            page.session.expenses = pd.concat([page.session.expenses, new_expense], ignore_index=True, sort=False)
-            ic(page.session.expenses)
+            gasto = page.session.expenses.añadir(persona, concepto, importe)
             page.session.remaining_personas.remove(persona)
             persona_field.options = [ft.dropdown.Option(p) for p in page.session.remaining_personas]
-            update_expenses_table()
+            add_expense_row(gasto)
             persona_field.value = ""
             concepto_field.value = ""
             importe_field.value = ""
@@ -115,14 +107,11 @@ def main(page: ft.Page):
 
 
     # Botón para eliminar un gasto
-    def delete_expense(index):
-        persona = page.session.expenses.loc[index, "Persona"]
-        ic(persona)
-        page.session.expenses.drop(index, inplace=True)
-        page.session.expenses.reset_index(drop=True, inplace=True)
-        page.session.remaining_personas.append(persona)
+    def delete_expense(gasto_id: int):
+        gasto = page.session.expenses.eliminar(gasto_id)
+        page.session.remaining_personas.append(gasto.persona)
         persona_field.options = [ft.dropdown.Option(p) for p in page.session.remaining_personas]
-        update_expenses_table()
+        remove_expense_row(gasto_id)
         page.update()
 
 
@@ -207,24 +196,20 @@ def main(page: ft.Page):
 
 
     # Botón para ajustar cuentas y crear gráficos
-    def calculate_balances(e: ft.ControlEvent) -> None:
+    async def calculate_balances(e: ft.ControlEvent) -> None:
         # Generamos el dict para enviar al backend
-        gastos = [
-            {"Persona": row["Persona"], "Concepto": row["Concepto"], "Importe": row["Importe"]} 
-            for index, row in page.session.expenses.iterrows()
-            ]
+        gastos = page.session.expenses.to_records()
         colores_dict = page.session.colores
         # Calculamos el gasto total y el gasto medio y guardamos en sesión
-        gasto_total = page.session.expenses["Importe"].sum()
+        gasto_total = page.session.expenses.total
         gasto_medio = gasto_total / len(gastos) if len(gastos) > 0 else 0
 
         page.session.gasto_total = gasto_total
         page.session.gasto_medio = gasto_medio
 
         if gastos and len(gastos) > 1 and gasto_total > 0.0:
-            response = requests.post(f"{settings.BACKEND_URL}/calcular_ajustes", json=gastos)
-            if response.status_code == 200:
-                ajustes: dict[str, Any] = response.json()["ajustes"]
+            ajustes = await api.calcular_ajustes(gastos)
+            if ajustes is not None:
                 # Guardamos en sesión los ajustes
                 page.session.ajustes = ajustes
 
@@ -248,12 +233,14 @@ def main(page: ft.Page):
                 ajustes_section.controls.extend([ajustes_list, ft.Divider(), gastos_chart])
                 save_button.disabled = False
                 page.update()
+            else:
+                show_snack_bar("Error calculando los ajustes.", "red")
         else:
             show_snack_bar("No hay gastos para ajustar.", "red")
 
 
     # Guardar barbacoa
-    def save_current_barbacoa(e):
+    async def save_current_barbacoa(e):
         # Validamos que hayan puesto un nombre de barbacoa
         if not barbacoa_field.value:
             show_snack_bar("Debes introducir un nombre de barbacoa.", "red")
@@ -264,28 +251,28 @@ def main(page: ft.Page):
             "fecha": datetime.now().strftime("%d-%m-%Y"),
             "nombre": str(barbacoa_field.value).strip(),
             "ajustes": page.session.ajustes,
-            "gastos": page.session.expenses.to_dict(orient="records"),
+            "gastos": page.session.expenses.to_records(),
             "gasto_total": page.session.gasto_total,
             "gasto_medio": page.session.gasto_medio,
-            "participantes": page.session.expenses.Persona.tolist()
+            "participantes": page.session.expenses.personas()
         }
         ic("OBJETO BARBACOA PARA GUARDAR EN DB")
         ic(barbacoa)
-        response = requests.post(settings.GUARDAR_BARBACOA_URL, json=barbacoa)
-        if response.status_code == 200:
-            display_saved_barbacoas()
+        error = await api.guardar_barbacoa(barbacoa)
+        if error is None:
+            cache.invalidar_barbacoas()
+            # El listado se actualiza con el evento de cambios del backend
             show_snack_bar("Barbacoa guardada correctamente.", "green")
         else:
-            msg = response.json().get("detail", "Error guardando la barbacoa.")
-            show_snack_bar(msg, "red")
+            show_snack_bar(error, "red")
 
 
 # Popup confirmación para borrar bbq
     def confirm_delete(barbacoa_name):
-        def on_confirm(e):
-            status_code = delete_barbacoa(barbacoa_name)
+        async def on_confirm(e):
+            status_code = await api.delete_barbacoa(barbacoa_name)
             if status_code == 200:
-                display_saved_barbacoas()
+                cache.invalidar_barbacoas()
                 show_snack_bar(f"Barbacoa {barbacoa_name} eliminada.", "green")
             else:
                 show_snack_bar(f"Error al borrar la barbacoa {barbacoa_name}.", "red")
@@ -311,7 +298,12 @@ def main(page: ft.Page):
 
 
     # Mostrar ventana con detalles de la barbacoa
-    def display_barbacoa_details(barbacoa: dict[str, Any]):
+    async def display_barbacoa_details(barbacoa_nombre: str):
+        barbacoa = await api.load_barbacoa(barbacoa_nombre)
+        if barbacoa is None:
+            show_snack_bar(f"No se ha podido cargar la barbacoa {barbacoa_nombre}.", "red")
+            return
+
         def close_dialog(e):
             dialog.open = False
             page.update()
@@ -362,30 +354,101 @@ def main(page: ft.Page):
 
 
     # Mostrar todas las barbacoas guardadas
-    def display_saved_barbacoas():
-        barbacoas: list[dict[str, Any]] = load_barbacoas()
-        list_view = ft.ListView(expand=True, spacing=10)
-
-        for idx, barbacoa in enumerate(barbacoas, 1):
-            barbacoa_item = ft.Container(ft.Row([
-                ft.Row([ft.Text(f"{idx}"), ft.Text(barbacoa.get('nombre', 'Barbacoa sin nombre'), weight=ft.FontWeight.BOLD), ft.Text('-'),ft.Text(barbacoa['fecha'])]),
-                ft.IconButton(
-                    icon=ft.icons.DELETE,
-                    on_click=lambda e, barbacoa_name=barbacoa.get('nombre', 'Barbacoa'): confirm_delete(barbacoa_name),
-                    tooltip="Eliminar",
-                    icon_color=ft.colors.RED_700
-                )
-                ], alignment=ft.MainAxisAlignment.SPACE_BETWEEN),
-                border_radius=ft.border_radius.all(10),
-                padding=ft.padding.all(10),
-                #bgcolor=ft.colors.GREY_50,
-                border=ft.border.all(1, ft.colors.GREY_300),
-                on_click=lambda e, barbacoa=barbacoa: display_barbacoa_details(barbacoa),
-                ink=True
+    # Elemento del listado de barbacoas guardadas
+    def create_barbacoa_item(idx: int, barbacoa: dict[str, Any]) -> ft.Container:
+        async def on_click_barbacoa(e, barbacoa_name=barbacoa.get('nombre')):
+            await display_barbacoa_details(barbacoa_name)
+
+        # El número se guarda en data para renumerar al eliminar
+        numero = ft.Text(f"{idx}")
+        item = ft.Container(ft.Row([
+            ft.Row([numero, ft.Text(barbacoa.get('nombre', 'Barbacoa sin nombre'), weight=ft.FontWeight.BOLD), ft.Text('-'),ft.Text(barbacoa['fecha'])]),
+            ft.IconButton(
+                icon=ft.icons.DELETE,
+                on_click=lambda e, barbacoa_name=barbacoa.get('nombre', 'Barbacoa'): confirm_delete(barbacoa_name),
+                tooltip="Eliminar",
+                icon_color=ft.colors.RED_700
             )
-            list_view.controls.append(barbacoa_item)
-        
-        listview_bbq_container.content = list_view
+            ], alignment=ft.MainAxisAlignment.SPACE_BETWEEN),
+            border_radius=ft.border_radius.all(10),
+            padding=ft.padding.all(10),
+            #bgcolor=ft.colors.GREY_50,
+            border=ft.border.all(1, ft.colors.GREY_300),
+            on_click=on_click_barbacoa,
+            ink=True,
+            data=numero
+        )
+        barbacoa_items[barbacoa.get('nombre')] = item
+        return item
+
+
+    # Carga la siguiente página de barbacoas guardadas al final del listado
+    async def load_next_barbacoas():
+        nonlocal barbacoas_siguiente, barbacoas_cargando, barbacoas_completas
+        if barbacoas_cargando or barbacoas_completas:
+            return
+        barbacoas_cargando = True
+        generacion = barbacoas_generacion
+        try:
+            pagina = await cache.pagina_barbacoas(barbacoas_siguiente)
+        finally:
+            if generacion == barbacoas_generacion:
+                barbacoas_cargando = False
+        if generacion != barbacoas_generacion:
+            # El listado se ha recargado mientras tanto
+            return
+        if pagina is None:
+            show_snack_bar("Error cargando las barbacoas guardadas.", "red")
+            return
+
+        inicio = len(saved_list_view.controls) + 1
+        saved_list_view.controls.extend(
+            create_barbacoa_item(idx, barbacoa)
+            for idx, barbacoa in enumerate(pagina["barbacoas"], inicio)
+        )
+        barbacoas_siguiente = pagina["siguiente"]
+        barbacoas_completas = barbacoas_siguiente is None
+        page.update()
+
+
+    async def on_scroll_barbacoas(e: ft.OnScrollEvent):
+        if e.pixels >= e.max_scroll_extent - settings.LISTA_BARBACOAS_MARGEN_CARGA:
+            await load_next_barbacoas()
+
+    saved_list_view.on_scroll = on_scroll_barbacoas
+
+
+    # Mostrar las barbacoas guardadas desde el principio
+    async def display_saved_barbacoas():
+        nonlocal barbacoas_siguiente, barbacoas_cargando, barbacoas_completas, barbacoas_generacion
+        barbacoas_generacion += 1
+        barbacoas_siguiente = None
+        barbacoas_cargando = False
+        barbacoas_completas = False
+        saved_list_view.controls.clear()
+        barbacoa_items.clear()
+        await load_next_barbacoas()
+
+
+    # Cambios hechos desde esta u otra sesión: se aplican al listado sin descargarlo
+    async def on_cambio_barbacoas(evento: dict[str, Any]):
+        if evento["tipo"] == "recargar":
+            await display_saved_barbacoas()
+            return
+        if evento["tipo"] == "insertada":
+            barbacoa = evento["barbacoa"]
+            # Si quedan páginas por cargar aparecerá al llegar al final
+            if not barbacoas_completas or barbacoa["nombre"] in barbacoa_items:
+                return
+            saved_list_view.controls.append(create_barbacoa_item(len(saved_list_view.controls) + 1, barbacoa))
+        elif evento["tipo"] == "eliminada":
+            item = barbacoa_items.pop(evento["nombre"], None)
+            if item is None:
+                return
+            saved_list_view.controls.remove(item)
+            for idx, control in enumerate(saved_list_view.controls, 1):
+                control.data.value = f"{idx}"
+        page.update()
 
 
     # Componentes de la página
@@ -395,9 +458,9 @@ def main(page: ft.Page):
         #bgcolor="blue", 
         padding=10)
 
-    # Inicialización del DataFrame
+    # Inicialización de los gastos
     if not hasattr(page.session, "expenses"):
-        page.session.expenses = pd.DataFrame(columns=["Persona", "Concepto", "Importe"])
+        page.session.expenses = LibroGastos()
     if not hasattr(page.session, "remaining_personas"):
         page.session.remaining_personas = [persona["nombre"] for persona in page.session.cuadrilla]
 
@@ -525,7 +588,8 @@ def main(page: ft.Page):
         ],
         rows=[],
     )
-    update_expenses_table()
+    for gasto in page.session.expenses:
+        add_expense_row(gasto)
 
     calculate_button = ft.IconButton(
         icon=ft.icons.CALCULATE,        
@@ -580,7 +644,9 @@ def main(page: ft.Page):
         width=420,
     )
     
-    display_saved_barbacoas()
+    await display_saved_barbacoas()
+    cambios.suscribir(on_cambio_barbacoas)
+    page.on_close = lambda e: cambios.cancelar(on_cambio_barbacoas)
     # Añadir los elementos al layout de la página
     saved_bbq_container = ft.Container(
         ft.Column(
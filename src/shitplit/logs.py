@@ -0,0 +1,18 @@
+"""
+Configuración de logs y de la salida de depuración de icecream.
+
+ic() escribe en el logger con nivel DEBUG y queda desactivado salvo que
+LOG_LEVEL sea DEBUG, para no pagar su coste ni su volumen en producción.
+"""
+import logging
+
+from icecream import ic
+
+import src.shitplit.settings as settings
+
+logging.basicConfig(level=settings.LOG_LEVEL, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+logger = logging.getLogger("shitplit")
+
+ic.configureOutput(prefix="ic| ", outputFunction=logger.debug)
+if not logger.isEnabledFor(logging.DEBUG):
+    ic.disable()
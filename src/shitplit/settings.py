@@ -1,19 +1,131 @@
+import os
 from pathlib import Path
 
+from dotenv import load_dotenv
+
+# Cargar las variables de entorno del archivo .env si está disponible
+# Para manejar desde el contenedor Docker
+load_dotenv("/app/.env" if os.path.exists("/app/.env") else ".env")
+
+# Nivel de log. ic() solo escribe con DEBUG
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
+# Cuadrilla con la que se crea el grupo por defecto la primera vez
 PERSONAS_FILE = Path("src/shitplit/backend/db") / "personas.json"
+# Grupo de las peticiones que no indican ninguno y de los datos anteriores a los grupos
+GRUPO_POR_DEFECTO = os.getenv("GRUPO_POR_DEFECTO", "principal")
+# Grupo con el que trabaja el frontend
+GRUPO = os.getenv("GRUPO", GRUPO_POR_DEFECTO)
 BARBACOAS_FILE = "barbacoas.json"
-BACKEND_URL = "http://localhost:8000"
+BACKEND_URL = os.getenv("BACKEND_URL", "http://localhost:8000")
+# Cliente HTTP del frontend: tiempos máximos en segundos y conexiones abiertas
+FRONTEND_TIMEOUT = float(os.getenv("FRONTEND_TIMEOUT", 10))
+FRONTEND_TIMEOUT_CONEXION = float(os.getenv("FRONTEND_TIMEOUT_CONEXION", 3))
+FRONTEND_MAX_CONEXIONES = int(os.getenv("FRONTEND_MAX_CONEXIONES", 20))
+# Segundos que se reutilizan la cuadrilla y el listado de barbacoas entre sesiones
+FRONTEND_CACHE_TTL = float(os.getenv("FRONTEND_CACHE_TTL", 30))
+# Listado de barbacoas guardadas: altura en píxeles y distancia al final a la
+# que se pide la página siguiente
+LISTA_BARBACOAS_ALTURA = 500
+LISTA_BARBACOAS_MARGEN_CARGA = 300
 APP_FONTS = {
     "Poppins": "fonts/Poppins-Medium.ttf",
 }
 
+# Segundos entre comprobaciones de cambios en la cuadrilla de un grupo
+CUADRILLA_INTERVALO_COMPROBACION = float(os.getenv("CUADRILLA_INTERVALO_COMPROBACION", 2))
+# A partir de cuántos gastos se usa la versión vectorizada del motor de ajustes
+UMBRAL_NUMPY = 2_000
+# Modo óptimo de ajustes: tiempo máximo de búsqueda antes de recurrir al voraz
+# y número máximo de saldos pendientes tras emparejar los opuestos
+OPTIMO_PRESUPUESTO_MS = float(os.getenv("OPTIMO_PRESUPUESTO_MS", 50))
+OPTIMO_MAX_PERSONAS = int(os.getenv("OPTIMO_MAX_PERSONAS", 18))
+# Caché de ajustes calculados: número de resultados y segundos que se guardan
+CACHE_AJUSTES_MAX = int(os.getenv("CACHE_AJUSTES_MAX", 1_024))
+CACHE_AJUSTES_TTL = float(os.getenv("CACHE_AJUSTES_TTL", 300))
+# Ajustes por lotes: a partir de cuántas barbacoas se reparten entre procesos
+LOTE_UMBRAL_PARALELO = int(os.getenv("LOTE_UMBRAL_PARALELO", 64))
+LOTE_WORKERS = int(os.getenv("LOTE_WORKERS", os.cpu_count() or 1))
+# Almacenamiento de las barbacoas: "mongo", "sqlite" o "memoria"
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "mongo")
+SQLITE_PATH = os.getenv("SQLITE_PATH", "shitplit.db")
+# Acceso a base de datos: hilos para las operaciones de pymongo, conexiones
+# del pool de Mongo, tiempo máximo por operación y reintentos de lectura
+DB_WORKERS = int(os.getenv("DB_WORKERS", 16))
+MONGO_POOL_SIZE = int(os.getenv("MONGO_POOL_SIZE", DB_WORKERS))
+MONGO_TIMEOUT_MS = int(os.getenv("MONGO_TIMEOUT_MS", 5_000))
+DB_REINTENTOS = int(os.getenv("DB_REINTENTOS", 2))
+DB_ESPERA_REINTENTO = 0.1
+# Tamaño de página del listado de barbacoas guardadas
+RESUMEN_LIMITE = 50
+RESUMEN_LIMITE_MAX = 500
+# Barbacoas que se leen de cada vez al exportar el histórico
+EXPORTAR_LOTE = int(os.getenv("EXPORTAR_LOTE", 200))
+# Barbacoas que se validan e insertan de cada vez al importar
+IMPORTAR_LOTE = int(os.getenv("IMPORTAR_LOTE", 500))
+# Segundos que como mucho se reutilizan las estadísticas si no hay escrituras
+# en el grupo
+ESTADISTICAS_TTL = float(os.getenv("ESTADISTICAS_TTL", 300))
+# Métricas con varios workers: directorio compartido en el que cada uno deja
+# sus valores (el lanzador lo crea si hace falta) y segundos entre escrituras
+METRICAS_DIR = os.getenv("METRICAS_DIR")
+METRICAS_INTERVALO = float(os.getenv("METRICAS_INTERVALO", 1))
+# Perfilado de peticiones: fracción que se perfila al azar, directorio y número
+# de perfiles que se conservan. Sin ADMIN_TOKEN no se puede pedir un perfil con
+# la cabecera X-Profile ni descargarlos
+PERFILES_MUESTREO = float(os.getenv("PERFILES_MUESTREO", 0))
+PERFILES_DIR = Path(os.getenv("PERFILES_DIR", "perfiles"))
+PERFILES_MAX = int(os.getenv("PERFILES_MAX", 50))
+# Token de la cabecera X-Admin-Token para los perfiles, para cambiar la
+# cuadrilla de un grupo y para reconstruir sus saldos. Sin él esas rutas responden 403
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+# Cambios en vivo de las barbacoas guardadas: segundos entre consultas de los
+# eventos publicados por otros procesos, segundos entre latidos de la conexión
+# y eventos que se conservan por grupo para las reconexiones
+CAMBIOS_INTERVALO = float(os.getenv("CAMBIOS_INTERVALO", 1))
+CAMBIOS_LATIDO = float(os.getenv("CAMBIOS_LATIDO", 15))
+CAMBIOS_EVENTOS_MAX = int(os.getenv("CAMBIOS_EVENTOS_MAX", 1_000))
+# Respuestas de barbacoas: a partir de cuántos bytes se comprimen (gzip o brotli)
+COMPRIMIR_MINIMO = int(os.getenv("COMPRIMIR_MINIMO", 1_024))
+# Lanzador (python -m src.shitplit serve): dirección y puertos, procesos del
+# backend (0 es uno por CPU disponible) y segundos para terminar las
+# peticiones en curso al parar
+SERVIDOR_HOST = os.getenv("SERVIDOR_HOST", "0.0.0.0")
+BACKEND_PORT = int(os.getenv("BACKEND_PORT", 8000))
+BACKEND_WORKERS = int(os.getenv("BACKEND_WORKERS", 0))
+SERVIDOR_ESPERA_CIERRE = float(os.getenv("SERVIDOR_ESPERA_CIERRE", 20))
+FRONTEND_PORT = int(os.getenv("FRONTEND_PORT", 60751))
+FRONTEND_SCRIPT = "src/shitplit/frontend/main.py"
+
 CALCULAR_AJUSTES_ENDPOINT = "/calcular_ajustes"
 CALCULAR_AJUSTES_URL = f"{BACKEND_URL}{CALCULAR_AJUSTES_ENDPOINT}"
+CALCULAR_AJUSTES_COMPARTIDOS_ENDPOINT = "/calcular_ajustes_compartidos"
+CALCULAR_AJUSTES_COMPARTIDOS_URL = f"{BACKEND_URL}{CALCULAR_AJUSTES_COMPARTIDOS_ENDPOINT}"
+CALCULAR_AJUSTES_LOTE_ENDPOINT = "/calcular_ajustes_lote"
+CALCULAR_AJUSTES_LOTE_URL = f"{BACKEND_URL}{CALCULAR_AJUSTES_LOTE_ENDPOINT}"
 GUARDAR_BARBACOA_ENDPOINT = "/guardar_barbacoa"
 GUARDAR_BARBACOA_URL = f"{BACKEND_URL}{GUARDAR_BARBACOA_ENDPOINT}"
 OBTENER_BARBACOAS_GUARDADAS_ENDPOINT = "/obtener_barbacoas_guardadas"
 OBTENER_BARBACOAS_GUARDADAS_URL = f"{BACKEND_URL}{OBTENER_BARBACOAS_GUARDADAS_ENDPOINT}"
+RESUMEN_BARBACOAS_ENDPOINT = "/resumen_barbacoas"
+RESUMEN_BARBACOAS_URL = f"{BACKEND_URL}{RESUMEN_BARBACOAS_ENDPOINT}"
+DETALLE_BARBACOA_ENDPOINT = "/detalle_barbacoa"
+DETALLE_BARBACOA_URL = f"{BACKEND_URL}{DETALLE_BARBACOA_ENDPOINT}"
 ELIMINAR_BARBACOA_ENDPOINT = "/eliminar_barbacoa"
 ELIMINAR_BARBACOA_URL = f"{BACKEND_URL}{ELIMINAR_BARBACOA_ENDPOINT}"
 LOAD_CUADRILLA_ENDPOINT = "/get_cuadrilla"
-LOAD_CUADRILLA_URL = f"{BACKEND_URL}{LOAD_CUADRILLA_ENDPOINT}"
\ No newline at end of file
+LOAD_CUADRILLA_URL = f"{BACKEND_URL}{LOAD_CUADRILLA_ENDPOINT}"
+GUARDAR_CUADRILLA_ENDPOINT = "/guardar_cuadrilla"
+GUARDAR_CUADRILLA_URL = f"{BACKEND_URL}{GUARDAR_CUADRILLA_ENDPOINT}"
+SALDOS_GLOBALES_ENDPOINT = "/saldos_globales"
+SALDOS_GLOBALES_URL = f"{BACKEND_URL}{SALDOS_GLOBALES_ENDPOINT}"
+RECONSTRUIR_SALDOS_ENDPOINT = "/reconstruir_saldos"
+EXPORTAR_BARBACOAS_ENDPOINT = "/exportar_barbacoas"
+EXPORTAR_BARBACOAS_URL = f"{BACKEND_URL}{EXPORTAR_BARBACOAS_ENDPOINT}"
+ESTADISTICAS_ENDPOINT = "/estadisticas"
+ESTADISTICAS_URL = f"{BACKEND_URL}{ESTADISTICAS_ENDPOINT}"
+IMPORTAR_BARBACOAS_ENDPOINT = "/importar_barbacoas"
+IMPORTAR_BARBACOAS_URL = f"{BACKEND_URL}{IMPORTAR_BARBACOAS_ENDPOINT}"
+PERFILES_ENDPOINT = "/admin/perfiles"
+CAMBIOS_BARBACOAS_ENDPOINT = "/cambios_barbacoas"
+CAMBIOS_BARBACOAS_URL = f"{BACKEND_URL}{CAMBIOS_BARBACOAS_ENDPOINT}"
\ No newline at end of file
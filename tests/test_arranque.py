@@ -0,0 +1,10 @@
+from benchmarks.arranque import PROHIBIDOS, medir_una
+
+# Holgado a propósito: solo debe saltar si el import vuelve a cargar algo pesado
+MAXIMO_IMPORT_MS = 5000
+
+
+def test_importar_backend_no_carga_modulos_pesados():
+    medida = medir_una()
+    assert medida["cargados"] == [], f"El import carga {medida['cargados']} (no deberían cargarse: {PROHIBIDOS})"
+    assert medida["import_ms"] < MAXIMO_IMPORT_MS
@@ -0,0 +1,113 @@
+import random
+
+import pytest
+
+from src.shitplit.backend import settlement
+
+
+def ajustes_anteriores(gastos: list[tuple[str, float]], parejas: dict[str, str]) -> list[dict]:
+    """
+    El algoritmo de antes del motor, tal cual estaba en main.py pero sin pandas:
+    deudas respecto al gasto medio en euros y reparto con la pareja primero.
+    """
+    pagos: dict[str, float] = {}
+    for persona, importe in gastos:
+        pagos[persona] = pagos.get(persona, 0) + importe
+    gasto_medio = sum(importe for _, importe in gastos) / len(pagos) if pagos else 0
+    deudas = {persona: gasto_medio - pago for persona, pago in pagos.items()}
+    deudores = {p: d for p, d in deudas.items() if d > 0}
+    acreedores = {p: -d for p, d in deudas.items() if d < 0}
+
+    ajustes = []
+    for deudor, deuda in deudores.items():
+        pareja_deudor = parejas.get(deudor)
+        if pareja_deudor and pareja_deudor in acreedores:
+            pago = min(deuda, acreedores[pareja_deudor])
+            ajustes.append({"deudor": deudor, "acreedor": pareja_deudor, "pago": pago})
+            deuda -= pago
+            acreedores[pareja_deudor] -= pago
+            if acreedores[pareja_deudor] == 0:
+                del acreedores[pareja_deudor]
+            if deuda == 0:
+                continue
+        for acreedor, credito in list(acreedores.items()):
+            if deuda == 0:
+                break
+            pago = min(deuda, credito)
+            ajustes.append({"deudor": deudor, "acreedor": acreedor, "pago": pago})
+            deuda -= pago
+            acreedores[acreedor] -= pago
+            if acreedores[acreedor] == 0:
+                del acreedores[acreedor]
+    return ajustes
+
+
+def comprobar_iguales(ajustes: list[dict], esperados: list[dict]) -> None:
+    # El motor suma los pagos en céntimos enteros, así que los importes
+    # pueden diferir del cálculo anterior en el último bit
+    assert [(a["deudor"], a["acreedor"]) for a in ajustes] == [(a["deudor"], a["acreedor"]) for a in esperados]
+    assert [a["pago"] for a in ajustes] == pytest.approx([a["pago"] for a in esperados], abs=1e-6)
+
+
+def gastos_aleatorios(semilla: int) -> tuple[list[tuple[str, float]], dict[str, str]]:
+    rng = random.Random(semilla)
+    personas = [f"p{i}" for i in range(rng.randint(1, 30))]
+    gastos = [(rng.choice(personas), rng.randint(0, 20_000) / 100) for _ in range(rng.randint(1, 60))]
+    parejas: dict[str, str] = {}
+    for a, b in zip(personas[::2], personas[1::2]):
+        if rng.random() < 0.5:
+            parejas[a], parejas[b] = b, a
+    return gastos, parejas
+
+
+CASOS_FIJOS = [
+    ([("Ana", 30.0), ("Luis", 0.0), ("Eva", 0.0)], {}),
+    ([("Ana", 30.0), ("Luis", 0.0), ("Eva", 0.0)], {"Luis": "Ana", "Ana": "Luis"}),
+    ([("Ana", 10.5), ("Ana", 4.5), ("Luis", 20.0), ("Eva", 0.0), ("Raúl", 5.0)], {"Eva": "Luis", "Luis": "Eva"}),
+    ([("Ana", 12.0), ("Luis", 12.0)], {}),
+    ([("Ana", 0.0), ("Luis", 0.0), ("Eva", 0.0)], {}),
+    ([("Ana", 100.0)], {}),
+]
+
+
+@pytest.mark.parametrize("gastos, parejas", CASOS_FIJOS)
+def test_mismos_ajustes_que_antes_casos_fijos(gastos, parejas):
+    comprobar_iguales(settlement.calcular_ajustes(gastos, parejas), ajustes_anteriores(gastos, parejas))
+
+
+@pytest.mark.parametrize("semilla", range(200))
+def test_mismos_ajustes_que_antes_aleatorios(semilla):
+    gastos, parejas = gastos_aleatorios(semilla)
+    comprobar_iguales(settlement.calcular_ajustes(gastos, parejas), ajustes_anteriores(gastos, parejas))
+
+
+def test_mismos_ajustes_por_la_via_numpy():
+    rng = random.Random(0)
+    personas = [f"p{i}" for i in range(300)]
+    gastos = [(rng.choice(personas), rng.randint(0, 20_000) / 100) for _ in range(settlement.settings.UMBRAL_NUMPY + 1)]
+    comprobar_iguales(settlement.calcular_ajustes(gastos), ajustes_anteriores(gastos, {}))
+
+
+def saldos_netos(ajustes: list[dict]) -> dict[str, int]:
+    return {p: c for p, c in settlement.variacion_saldos(ajustes).items() if c}
+
+
+@pytest.mark.parametrize("semilla", range(100))
+def test_optimo_no_hace_mas_transferencias_que_voraz(semilla):
+    gastos, parejas = gastos_aleatorios(semilla)
+    voraz = settlement.calcular_ajustes(gastos, parejas, "voraz")
+    # Presupuesto amplio para que no caiga al voraz por ir lenta la máquina
+    optimo = settlement.calcular_ajustes(gastos, parejas, "optimo", presupuesto_ms=10_000)
+    assert len(optimo) <= len(voraz)
+    # Los dos liquidan lo mismo, salvo el redondeo a céntimos de cada transferencia
+    netos_voraz, netos_optimo = saldos_netos(voraz), saldos_netos(optimo)
+    for persona in netos_voraz.keys() | netos_optimo.keys():
+        assert abs(netos_voraz.get(persona, 0) - netos_optimo.get(persona, 0)) <= len(voraz) + len(optimo)
+
+
+def test_optimo_mejora_al_voraz():
+    # a debe 5 y b debe 10; c espera 10 y d espera 5. El voraz necesita
+    # tres transferencias y basta con dos
+    gastos = [("a", 10.0), ("b", 5.0), ("c", 25.0), ("d", 20.0)]
+    assert len(settlement.calcular_ajustes(gastos, modo="voraz")) == 3
+    assert len(settlement.calcular_ajustes(gastos, modo="optimo")) == 2
@@ -0,0 +1,80 @@
+import sqlite3
+
+import pytest
+
+from src.shitplit.backend.db.sqlite_store import SqliteStore
+from src.shitplit.backend.db.storage import NombreDuplicado
+from src.shitplit.backend.settlement import saldos_historico
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SqliteStore(str(tmp_path / "shitplit.db"))
+    store.crear_indices()
+    yield store
+    store.cerrar()
+
+
+def test_reemplazar_saldos_fallido_no_deja_nada(store):
+    store.reemplazar_saldos("g", {"a": 5, "b": -5})
+    # El segundo saldo no se puede guardar: el DELETE y el primer INSERT se deshacen
+    with pytest.raises(Exception):
+        store.reemplazar_saldos("g", {"z": 1, "y": object()})
+    assert store.get_saldos("g") == {"a": 5, "b": -5}
+
+
+def test_actualizar_saldos_fallido_no_deja_nada(store):
+    store.actualizar_saldos("g", {"a": 5, "b": -5})
+    with pytest.raises(Exception):
+        store.actualizar_saldos("g", {"a": 1, "b": object()})
+    assert store.get_saldos("g") == {"a": 5, "b": -5}
+
+
+def test_insertar_varias_devuelve_las_fallidas(store):
+    # Sin nombre no cumple NOT NULL: falla esa fila y las demás se guardan
+    fallidas = store.insertar_varias("g", [{"nombre": "a"}, {"nombre": None}, {"nombre": "c"}])
+    assert fallidas == {1}
+    assert [b["nombre"] for b in store.listar("g")] == ["a", "c"]
+
+
+def test_nombre_unico_por_grupo(store):
+    store.insertar("g", {"nombre": "a"})
+    with pytest.raises(NombreDuplicado):
+        store.insertar("g", {"nombre": "a"})
+    store.insertar("otro", {"nombre": "a"})
+    assert store.insertar_varias("g", [{"nombre": "a"}, {"nombre": "b"}]) == {0}
+
+
+def test_no_arranca_con_duplicadas_anteriores(tmp_path):
+    store = SqliteStore(str(tmp_path / "shitplit.db"))
+    # Tabla de antes del índice único, con el mismo nombre dos veces
+    store.insertar("g", {"nombre": "a"})
+    store.insertar("g", {"nombre": "a"})
+    with pytest.raises(RuntimeError, match="g/a"):
+        store.crear_indices()
+    store.cerrar()
+
+
+def test_insertar_solo_traduce_el_nombre_repetido(store):
+    # Un NOT NULL incumplido no es un duplicado y sale tal cual
+    with pytest.raises(sqlite3.IntegrityError):
+        store.insertar("g", {"nombre": None})
+
+
+def test_reconstruir_saldos_desde_los_ajustes(store):
+    store.insertar("g", {"nombre": "a", "ajustes": [{"deudor": "b", "acreedor": "a", "pago": 15.0}]})
+    store.insertar("g", {"nombre": "b"})
+    store.reemplazar_saldos("g", {"z": 99})
+    store.reconstruir_saldos("g", saldos_historico)
+    assert store.get_saldos("g") == {"a": 1500, "b": -1500}
+
+
+def test_reconstruir_saldos_fallido_no_deja_nada(store):
+    store.reemplazar_saldos("g", {"a": 5, "b": -5})
+
+    def fallar(historico):
+        raise ValueError
+
+    with pytest.raises(ValueError):
+        store.reconstruir_saldos("g", fallar)
+    assert store.get_saldos("g") == {"a": 5, "b": -5}